@@ -5,9 +5,12 @@ Telegram Product Scraper Bot - CORRECTED IMPLEMENTATION
 
 import os
 import re
+import atexit
 import time
+import asyncio
 import logging
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # Telegram bot framework
 from telegram.ext import (
@@ -17,12 +20,17 @@ from telegram.ext import (
     filters,
     ContextTypes
 )
-from telegram import Update
+from telegram import Update, InputMediaPhoto
 
 # Local modules
 import config
-from utils import setup_directories, format_output
-from scraper import process_link
+from utils import setup_directories, format_output, get_platform
+from scraper import run_job, resolve_link, enable_driver_pool, close_driver_pool
+from jobqueue import JobQueue
+from cache import SharedCache
+from state import StateStore
+from webhook import run_webhook
+from scheduler import ScrapeScheduler, SendQueue
 
 # Setup logging
 logging.basicConfig(
@@ -31,80 +39,268 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Global state
-LAST_PROCESSED = {}
+# Global state (shared stores so replicas agree)
+JOB_QUEUE = None
+CACHE = None
+STATE = None
+SCHEDULER = ScrapeScheduler()
+SEND_QUEUE = SendQueue()
+
+# In-process scrapes get their own threads so they cannot starve the default
+# executor used for state and cache lookups; the scheduler caps each platform,
+# so the sum of the caps is the most that can run at once
+SCRAPE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=sum(limits['concurrency'] for limits in config.SCRAPE_LIMITS.values()),
+    thread_name_prefix='scrape'
+)
 
 def setup_environment():
     """Setup the bot environment"""
     setup_directories()
     logger.info("Environment setup completed")
 
+async def scrape_link(link, pin_code, use_cache=True, on_extracted=None):
+    """Process a link, reusing a recent result from the shared cache if there is one"""
+    key = f"result:{pin_code}:{link}"
+    if use_cache:
+        cached = await asyncio.to_thread(CACHE.get, key)
+        # Screenshots may have been cleaned up since the result was cached
+        if cached and all(os.path.exists(path) for path in cached['images']):
+            return cached
+    
+    processed = await run_scrape(link, pin_code, on_extracted=on_extracted)
+    if processed:
+        await asyncio.to_thread(CACHE.set, key, processed, config.CACHE_TTL)
+    return processed
+
+async def send_text(message, text):
+    """Reply with text through the rate-limited send queue"""
+    return await SEND_QUEUE.send(message.chat_id, lambda: message.reply_text(text))
+
+def read_image(path):
+    """Read a screenshot file, closing it before the upload starts"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+async def send_images(message, images, caption):
+    """Reply with a photo, or one album for several, through the send queue
+
+    Returns the message carrying the caption (the album's first item).
+    """
+    if len(images) == 1:
+        return await SEND_QUEUE.send(
+            message.chat_id,
+            lambda: message.reply_photo(photo=read_image(images[0]), caption=caption)
+        )
+    
+    def send_album():
+        media = [
+            InputMediaPhoto(read_image(path), caption=caption if index == 0 else None)
+            for index, path in enumerate(images)
+        ]
+        return message.reply_media_group(media)
+    
+    # Telegram counts every photo in an album against the flood limits
+    sent = await SEND_QUEUE.send(message.chat_id, send_album, cost=len(images))
+    return sent[0]
+
+async def run_scrape(link, pin_code, kind='scrape', on_extracted=None):
+    """Run a job within its platform's concurrency and rate limits"""
+    # Short links only reveal their platform once expanded
+    if kind == 'scrape':
+        link = await asyncio.to_thread(resolve_link, link)
+        if not link:
+            return None
+    async with SCHEDULER.slot(get_platform(link)):
+        return await dispatch_job(kind, link, pin_code, on_extracted)
+
+async def dispatch_job(kind, link, pin_code, on_extracted=None):
+    """Run a job on the worker queue, or in a thread when the queue is off"""
+    if not config.JOB_QUEUE_ENABLED:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(SCRAPE_EXECUTOR, run_job, kind, link, pin_code, on_extracted)
+    
+    job_id = await asyncio.to_thread(JOB_QUEUE.enqueue, link, pin_code, None, kind)
+    
+    # Allow every attempt to use its full lease before giving up
+    deadline = time.time() + config.JOB_TIMEOUT * config.JOB_MAX_ATTEMPTS
+    while time.time() < deadline:
+        await asyncio.sleep(config.JOB_POLL_INTERVAL)
+        job = await asyncio.to_thread(JOB_QUEUE.get, job_id)
+        if on_extracted and job['partial']:
+            on_extracted(job['partial'])
+            on_extracted = None
+        if job['status'] == 'done':
+            return job['result']
+        if job['status'] == 'failed':
+            raise Exception(job['error'] or "Scrape job failed")
+    raise Exception("Timed out waiting for a scraper worker")
+
+def without_stock(processed):
+    """Copy of a result for the chat state; stock answers go stale, so /img leaves them out"""
+    return {key: value for key, value in processed.items() if key != 'stock'}
+
+async def send_result(message, processed, advanced=False):
+    """Reply with a processed result: screenshot with caption, or text only"""
+    formatted_text = format_output(processed, advanced)
+    if processed['images']:
+        return await send_images(message, processed['images'], formatted_text)
+    return await send_text(message, formatted_text)
+
+async def reply_progressively(message, link, pin_code, advanced=False):
+    """Reply with the text as soon as it is extracted, then swap in the screenshot
+
+    Telegram cannot edit a text message into a media message, so once the
+    screenshots are ready they are sent with the caption and the text is deleted.
+    Returns the processed result (without images on screenshot timeout) and
+    the reply message, or (None, None).
+    """
+    loop = asyncio.get_running_loop()
+    extracted = loop.create_future()
+    
+    def on_extracted(data):
+        # Runs in a scraper thread; hedged scrapes may call it twice
+        loop.call_soon_threadsafe(lambda: extracted.done() or extracted.set_result(data))
+    
+    scrape = asyncio.create_task(scrape_link(link, pin_code, on_extracted=on_extracted))
+    await asyncio.wait({scrape, extracted}, return_when=asyncio.FIRST_COMPLETED)
+    
+    # Cached result, or the scrape ended before extraction
+    if scrape.done():
+        extracted.cancel()
+        processed = scrape.result()
+        if not processed:
+            return None, None
+        return processed, await send_result(message, processed, advanced)
+    
+    # Text first, so users don't wait on the screenshot
+    partial = extracted.result()
+    text_message = await send_text(message, format_output(partial, advanced))
+    
+    # A scrape that outlives the timeout must not log an unretrieved exception
+    scrape.add_done_callback(lambda task: task.cancelled() or task.exception())
+    try:
+        processed = await asyncio.wait_for(asyncio.shield(scrape), config.SCREENSHOT_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Screenshot timed out for {link}, keeping text-only reply")
+        return partial, text_message
+    except Exception as e:
+        logger.error(f"Screenshot failed for {link}: {str(e)}")
+        return partial, text_message
+    
+    if not processed or not processed['images']:
+        return processed or partial, text_message
+    
+    formatted_text = format_output(processed, advanced)
+    photo_message = await send_images(message, processed['images'], formatted_text)
+    await SEND_QUEUE.send(message.chat_id, text_message.delete)
+    return processed, photo_message
+
+async def add_stock_section(reply, processed, pins):
+    """Check availability for each pin and edit it into the sent reply"""
+    try:
+        stock = await run_scrape(processed['url'], ','.join(pins), kind='stock')
+        if not stock:
+            return
+        processed['stock'] = stock
+        formatted_text = format_output(processed, advanced=True)
+        if reply.photo:
+            await SEND_QUEUE.send(reply.chat_id, lambda: reply.edit_caption(formatted_text))
+        else:
+            await SEND_QUEUE.send(reply.chat_id, lambda: reply.edit_text(formatted_text))
+    except Exception as e:
+        logger.warning(f"Stock check failed for {processed['url']}: {str(e)}")
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send a message when the command /start is issued."""
-    await update.message.reply_text(
+    await send_text(
+        update.message,
         "🛒 Product Scraper Bot\n\n"
         "I automatically process product links from:\n"
         "• Amazon • Flipkart • Meesho • Myntra • Ajio • Snapdeal\n\n"
         "Commands:\n"
         "/advancing - Switch to High-Advanced Mode\n"
         "/off_advancing - Switch to Medium Mode\n"
-        "/img - Regenerate last message with new screenshots"
+        "/img - Regenerate last message with new screenshots\n"
+        "/pin 110001 - Set default delivery pin code"
     )
 
 async def mode_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle mode switching commands"""
+    """Handle mode switching commands (per chat)"""
     command = update.effective_message.text
+    chat_id = update.effective_chat.id
     
     if command == '/advancing':
-        config.MODE_ADVANCED = True
-        await update.effective_message.reply_text("✅ Switched to High-Advanced Mode\n\n"
-                                                "• Full smart features enabled\n"
-                                                "• Stock verification\n"
-                                                "• Price optimization\n"
-                                                "• Screenshot replacement\n"
-                                                "• Advanced formatting")
+        await asyncio.to_thread(STATE.update, chat_id, advanced=True)
+        await send_text(update.effective_message,
+                        "✅ Switched to High-Advanced Mode\n\n"
+                        "• Full smart features enabled\n"
+                        "• Stock verification\n"
+                        "• Price optimization\n"
+                        "• Screenshot replacement\n"
+                        "• Advanced formatting")
     elif command == '/off_advancing':
-        config.MODE_ADVANCED = False
-        await update.effective_message.reply_text("✅ Switched to Medium Mode\n\n"
-                                                "• Fast processing\n"
-                                                "• Basic scraping\n"
-                                                "• Minimal checks\n"
-                                                "• Optimized for speed")
+        await asyncio.to_thread(STATE.update, chat_id, advanced=False)
+        await send_text(update.effective_message,
+                        "✅ Switched to Medium Mode\n\n"
+                        "• Fast processing\n"
+                        "• Basic scraping\n"
+                        "• Minimal checks\n"
+                        "• Optimized for speed")
     else:
-        await update.effective_message.reply_text("❌ Unknown command")
+        await send_text(update.effective_message, "❌ Unknown command")
+
+async def pin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Set the chat's default delivery pin code"""
+    chat_id = update.effective_chat.id
+    
+    if len(context.args) != 1 or not re.fullmatch(r'\d{6}', context.args[0]):
+        state = await asyncio.to_thread(STATE.get, chat_id)
+        await send_text(update.effective_message,
+                        f"Current pin: {state['pin']}\nUsage: /pin 110001")
+        return
+    
+    await asyncio.to_thread(STATE.update, chat_id, pin=context.args[0])
+    await send_text(update.effective_message, f"✅ Default pin set to {context.args[0]}")
 
 async def img_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Regenerate last message with new screenshots"""
     chat_id = update.effective_chat.id
     
-    if chat_id not in LAST_PROCESSED:
-        await update.effective_message.reply_text("❌ No previous link to process")
+    state = await asyncio.to_thread(STATE.get, chat_id)
+    if not state['link']:
+        await send_text(update.effective_message, "❌ No previous link to process")
         return
     
     try:
-        link_data = LAST_PROCESSED[chat_id]
-        pin_code = config.PIN_DEFAULT
+        processed = state['result']
+        if processed:
+            # Only the screenshot is stale; title, price and sizes are reused
+            images = await run_scrape(processed['url'], state['pin'], kind='screenshot')
+            if not images:
+                await send_text(update.effective_message, "❌ Could not generate screenshot")
+                return
+            processed['images'] = images
+            await asyncio.to_thread(STATE.update, chat_id, result=processed)
+        else:
+            # The last link never processed, so run it fully
+            processed = await scrape_link(state['link'], state['pin'], use_cache=False)
         
-        # Re-process the link to get new screenshots
-        processed = process_link(link_data['link'], pin_code)
         if processed:
             # Format the output
-            formatted_text = format_output(processed)
+            formatted_text = format_output(processed, state['advanced'])
             
             # Send message with appropriate media
             if processed['images']:
-                await update.effective_message.reply_photo(
-                    photo=open(processed['images'][0], 'rb'),
-                    caption=formatted_text
-                )
-                await update.effective_message.reply_text("✅ Screenshots updated")
+                await send_images(update.effective_message, processed['images'], formatted_text)
+                await send_text(update.effective_message, "✅ Screenshots updated")
             else:
-                await update.effective_message.reply_text("❌ Could not generate screenshot")
+                await send_text(update.effective_message, "❌ Could not generate screenshot")
         else:
-            await update.effective_message.reply_text("❌ Could not regenerate message")
+            await send_text(update.effective_message, "❌ Could not regenerate message")
     except Exception as e:
         logger.error(f"Error regenerating screenshots: {str(e)}")
-        await update.effective_message.reply_text(f"❌ Error updating screenshots: {str(e)}")
+        await send_text(update.effective_message, f"❌ Error updating screenshots: {str(e)}")
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Process incoming messages for product links"""
@@ -121,55 +317,68 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Find all links in the message
     links = re.findall(r'https?://[^\s]+', text)
     
+    state = await asyncio.to_thread(STATE.get, chat_id)
+    
     # Process each detected link
     for link in links:
         try:
-            # Store the last processed link for /img command
-            LAST_PROCESSED[chat_id] = {
-                'link': link,
-                'timestamp': time.time()
-            }
+            # Store the last link for /img command
+            await asyncio.to_thread(STATE.update, chat_id, link=link, result=None)
             
-            # Extract pin code if available
-            pin_code = config.PIN_DEFAULT
-            pin_match = re.search(r'pin\s*[:\-]?\s*(\d{6})', text, re.IGNORECASE)
+            # Extract pin codes if available ("pin 110001" or "pins 110001, 560001")
+            pins = []
+            pin_match = re.search(r'pins?\s*[:\-]?\s*(\d{6}(?:[\s,/]+\d{6})*)', text, re.IGNORECASE)
             if pin_match:
-                pin_code = pin_match.group(1)
+                pins = re.findall(r'\d{6}', pin_match.group(1))
+            pin_code = pins[0] if pins else state['pin']
             
-            # Process the link
-            processed = process_link(link, pin_code)
+            # Process the link, replying as results come in
+            processed, reply = await reply_progressively(message, link, pin_code, state['advanced'])
             if processed:
-                # Format the output
-                formatted_text = format_output(processed)
+                # Keep the result so /img only has to redo the screenshot
+                await asyncio.to_thread(STATE.update, chat_id, result=without_stock(processed))
                 
-                # Send message with appropriate media
-                if processed['images']:
-                    await message.reply_photo(
-                        photo=open(processed['images'][0], 'rb'),
-                        caption=formatted_text
+                # Advanced mode verifies stock for every requested pin, in the
+                # background so the next link does not wait for it
+                if state['advanced'] and processed.get('is_clothing') and reply:
+                    context.application.create_task(
+                        add_stock_section(reply, processed, pins or [pin_code]), update=update
                     )
-                else:
-                    await message.reply_text(formatted_text)
             else:
-                await message.reply_text(f"❌ Could not process link: {link}")
+                await send_text(message, f"❌ Could not process link: {link}")
                 
         except Exception as e:
             logger.error(f"Error processing link {link}: {str(e)}")
-            await message.reply_text(f"❌ Error processing link: {str(e)}")
+            await send_text(message, f"❌ Error processing link: {str(e)}")
 
 def main():
     """Start the bot."""
+    global JOB_QUEUE, CACHE, STATE
+    
     # CRITICAL: Use config.BOT_TOKEN directly
-    application = Application.builder().token(config.BOT_TOKEN).build()
+    # Updates are handled concurrently so slow scrapes don't queue up behind each other
+    application = Application.builder().token(config.BOT_TOKEN).concurrent_updates(True).build()
     
     # Setup environment
     setup_environment()
+    CACHE = SharedCache()
+    CACHE.purge()
+    STATE = StateStore()
+    STATE.purge(config.STATE_RETENTION)
+    if config.JOB_QUEUE_ENABLED:
+        JOB_QUEUE = JobQueue()
+        logger.info(f"Scrapes go to job queue at {config.JOB_QUEUE_PATH}")
+    else:
+        # Scrapes run in this process, so keep browsers warm between them
+        enable_driver_pool(config.BOT_DRIVER_POOL_SIZE)
+        atexit.register(close_driver_pool)
     
     # Register handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("advancing", mode_command))
     application.add_handler(CommandHandler("off_advancing", mode_command))
     application.add_handler(CommandHandler("img", img_command))
+    application.add_handler(CommandHandler("pin", pin_command))
     application.add_handler(MessageHandler(
         filters.TEXT & ~filters.COMMAND, 
         handle_message
@@ -181,7 +390,10 @@ def main():
     
     # Start the Bot
     logger.info("Starting bot...")
-    application.run_polling()
+    if config.WEBHOOK_ENABLED:
+        run_webhook(application)
+    else:
+        application.run_polling()
 
 # THIS IS THE CRITICAL PART - EXACTLY THIS FORMAT
 if __name__ == '__main__':
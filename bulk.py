@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Bulk catalog mode - process product links from a file or stdin into JSONL
+
+Usage:
+    python bulk.py links.txt -o results.jsonl
+    cat links.txt | python bulk.py - -o results.jsonl --resume
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import util as mp_util
+
+# Local modules
+import config
+import scraper
+from scheduler import platform_bucket
+from utils import setup_directories, format_output, get_platform
+
+# Setup logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def read_links(stream):
+    """Yield links from a text stream, one per line, skipping blanks and comments"""
+    for line in stream:
+        link = line.strip()
+        if link and not link.startswith('#'):
+            yield link
+
+def resolve_links(links, threads=config.BULK_RESOLVE_THREADS):
+    """Yield (link, clean URL or None) in input order, expanding short links
+    a few at a time in threads without reading the whole input first"""
+    window = deque()
+    with ThreadPoolExecutor(max_workers=threads) as resolver:
+        for link in links:
+            window.append((link, resolver.submit(scraper.resolve_link, link)))
+            if len(window) >= threads * 2:
+                link, future = window.popleft()
+                yield link, future.result()
+        while window:
+            link, future = window.popleft()
+            yield link, future.result()
+
+def load_checkpoint(path, retry_failed=False):
+    """Return the links already recorded in an output file"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    # Drop a partial last line left by a crash mid-write
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('ok') or not retry_failed:
+                done.add(record['link'])
+    return done
+
+def _init_worker():
+    """Give each worker process its own warm browser"""
+    setup_directories()
+    scraper.enable_driver_pool(1)
+    # Runs when the pool shuts the worker down (atexit does not fire there)
+    mp_util.Finalize(None, scraper.close_driver_pool, exitpriority=10)
+
+def _process(link, url, pin_code):
+    """Run one resolved link through process_link and build its output record"""
+    started = time.time()
+    record = {'link': link, 'ok': False}
+    try:
+        processed = scraper.process_link(url, pin_code)
+        if processed:
+            record.update(ok=True, text=format_output(processed), data=processed)
+        else:
+            record['error'] = "Could not process link"
+    except Exception as e:
+        record['error'] = str(e)
+    record['elapsed'] = round(time.time() - started, 2)
+    return record
+
+def _unseen(links, done, stats):
+    """Skip links already recorded (on resume) or repeated in the input"""
+    for link in links:
+        if link in done:
+            stats['skipped'] += 1
+            continue
+        done.add(link)
+        yield link
+
+def _new_pool(workers):
+    """Start a pool of scraper worker processes"""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+def _write(out, record):
+    """Append one record and make sure it hits the disk before moving on"""
+    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    out.flush()
+    os.fsync(out.fileno())
+
+def run_bulk(links, output, workers=config.BULK_WORKERS, pin_code=config.PIN_DEFAULT,
+             resume=False, retry_failed=False):
+    """Process links in parallel, writing JSONL records as they complete"""
+    done = load_checkpoint(output, retry_failed) if resume else set()
+    buckets = {}
+    max_in_flight = workers * 2
+    stats = {'ok': 0, 'failed': 0, 'skipped': 0}
+    pending = {}  # future -> (link, platform)
+    pool = _new_pool(workers)
+
+    def drain(timeout):
+        if not pending:
+            time.sleep(timeout or 0)
+            return
+        finished, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in finished:
+            link, _ = pending.pop(future)
+            try:
+                record = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (e.g. OOM-killed next to Chrome); every job in the pool is lost
+                record = {'link': link, 'ok': False, 'error': f"Worker process died: {str(e)}"}
+            stats['ok' if record['ok'] else 'failed'] += 1
+            _write(out, record)
+
+    def submit(link, url, platform):
+        nonlocal pool
+        try:
+            future = pool.submit(_process, link, url, pin_code)
+        except BrokenProcessPool:
+            # The lost links were recorded by drain(); carry on with fresh workers
+            logger.warning("Worker pool broke, starting a new one")
+            pool.shutdown(wait=False)
+            pool = _new_pool(workers)
+            future = pool.submit(_process, link, url, pin_code)
+        pending[future] = (link, platform)
+
+    def in_flight(platform):
+        return sum(1 for _, p in pending.values() if p == platform)
+
+    def submit_ready():
+        """Submit queued links from every platform with capacity; returns the
+        seconds until the next rate-limited one could go, or None"""
+        next_ready = None
+        for platform, queue in queues.items():
+            concurrency = config.SCRAPE_LIMITS.get(platform, config.SCRAPE_LIMITS['default'])['concurrency']
+            while queue and len(pending) < max_in_flight and in_flight(platform) < concurrency:
+                delay = buckets[platform].wait_time()
+                if delay > 0:
+                    next_ready = delay if next_ready is None else min(next_ready, delay)
+                    break
+                buckets[platform].reserve()
+                link, url = queue.popleft()
+                submit(link, url, platform)
+        return next_ready
+
+    # Links wait in per-platform queues, so a throttled platform only holds
+    # back its own links; input order is kept within each platform
+    queues = {}  # platform -> deque of (link, url)
+    with open(output, 'a' if resume else 'w', encoding='utf-8') as out:
+        try:
+            # Links are expanded first so short links count against the real platform
+            source = resolve_links(_unseen(links, done, stats))
+            exhausted = False
+            while True:
+                while not exhausted and sum(map(len, queues.values())) < config.BULK_LOOKAHEAD:
+                    item = next(source, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    link, url = item
+                    if not url:
+                        stats['failed'] += 1
+                        _write(out, {'link': link, 'ok': False, 'error': "Could not unshorten link"})
+                        continue
+                    platform = get_platform(url)
+                    if platform not in queues:
+                        queues[platform] = deque()
+                        buckets[platform] = platform_bucket(config.SCRAPE_LIMITS, platform)
+                    queues[platform].append((link, url))
+
+                next_ready = submit_ready()
+                if exhausted and not pending and not any(queues.values()):
+                    break
+                # Write results until a worker frees up or a token comes due
+                drain(next_ready)
+        finally:
+            pool.shutdown()
+
+    return stats
+
+def main():
+    """Parse arguments and run bulk processing"""
+    parser = argparse.ArgumentParser(description="Process product links into JSONL")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="File with one link per line, or - for stdin")
+    parser.add_argument('-o', '--output', required=True, help="JSONL output file")
+    parser.add_argument('-w', '--workers', type=int, default=config.BULK_WORKERS,
+                        help="Number of worker processes")
+    parser.add_argument('--pin', default=config.PIN_DEFAULT, help="Delivery pin code")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip links already recorded in the output file")
+    parser.add_argument('--retry-failed', action='store_true',
+                        help="With --resume, process previously failed links again")
+    args = parser.parse_args()
+
+    stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    try:
+        stats = run_bulk(read_links(stream), args.output, args.workers, args.pin,
+                         args.resume, args.retry_failed)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    logger.info(f"Bulk run finished: {stats['ok']} ok, {stats['failed']} failed, "
+                f"{stats['skipped']} skipped")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Shared key/value cache for the Telegram Product Scraper Bot
+
+Backed by a SQLite database in WAL mode so several bot replicas on the same
+host (or volume) reuse each other's recent scrape results.
+"""
+
+import json
+import time
+
+import config
+from db import ThreadLocalConnection
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires REAL
+);
+"""
+
+class SharedCache:
+    """JSON values with optional expiry, stored in SQLite"""
+
+    def __init__(self, path=None):
+        self.path = path or config.CACHE_PATH
+        self._conn = ThreadLocalConnection(self.path)
+        self._conn().executescript(SCHEMA)
+
+    def get(self, key):
+        """Return the value for a key, or None if missing or expired"""
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        """Store a value, expiring after ttl seconds if given"""
+        expires = time.time() + ttl if ttl else None
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, json.dumps(value), expires)
+        )
+
+    def delete(self, key):
+        """Remove a key"""
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge(self):
+        """Delete expired entries"""
+        self._conn().execute(
+            "DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?", (time.time(),)
+        )
@@ -0,0 +1,97 @@
+"""
+Multi-region screenshot capture for the Telegram Product Scraper Bot
+
+Captures several element-clipped regions (product shot, price/size block,
+offer banner) in one page visit: a single script call measures every
+region, one full-page capture covers them all, and the crops are encoded
+in parallel. Regions that come out near-empty (blank placeholders, lazy
+images that never loaded) are skipped.
+"""
+
+import io
+import time
+import uuid
+import base64
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageStat
+
+import config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Returns each selector's first match as a page-coordinate rect, or null
+MEASURE_SCRIPT = """
+const rects = arguments[0].map(selector => {
+    const element = document.querySelector(selector);
+    if (!element) return null;
+    const rect = element.getBoundingClientRect();
+    if (rect.width < 1 || rect.height < 1) return null;
+    return {x: rect.left + window.scrollX, y: rect.top + window.scrollY,
+            width: rect.width, height: rect.height};
+});
+return {rects: rects, width: document.documentElement.clientWidth};
+"""
+
+_ENCODER = ThreadPoolExecutor(max_workers=config.CAPTURE_ENCODE_THREADS,
+                              thread_name_prefix='encode')
+
+def is_near_empty(image):
+    """Cheap blank check on a tiny grayscale thumbnail"""
+    thumbnail = image.convert('L').resize((32, 32))
+    return ImageStat.Stat(thumbnail).stddev[0] < config.CAPTURE_MIN_STDDEV
+
+def _save_region(image, box, filename):
+    """Crop one region and write it as PNG; returns the path or None if blank"""
+    region = image.crop(box)
+    if is_near_empty(region):
+        return None
+    region.save(filename, 'PNG')
+    return filename
+
+def capture_regions(driver, platform, prefix):
+    """Capture the platform's configured regions; returns saved paths (maybe empty)"""
+    regions = config.CAPTURE_REGIONS.get(platform)
+    if not regions:
+        return []
+
+    names = list(regions)
+    measured = driver.execute_script(MEASURE_SCRIPT, [regions[name] for name in names])
+    found = [(name, rect) for name, rect in zip(names, measured['rects']) if rect]
+    if not found:
+        return []
+
+    # One capture down to the lowest region, beyond the viewport if needed
+    bottom = min(max(rect['y'] + rect['height'] for _, rect in found), config.CAPTURE_MAX_HEIGHT)
+    shot = driver.execute_cdp_cmd('Page.captureScreenshot', {
+        'format': 'png',
+        'captureBeyondViewport': True,
+        'clip': {'x': 0, 'y': 0, 'width': measured['width'], 'height': bottom, 'scale': 1}
+    })
+    image = Image.open(io.BytesIO(base64.b64decode(shot['data'])))
+    image.load()
+
+    # The capture is in device pixels; rects are in CSS pixels
+    scale = image.width / measured['width']
+    padding = config.CAPTURE_PADDING
+    timestamp = int(time.time())
+    jobs = []
+    for name, rect in found:
+        box = (
+            max(0, int((rect['x'] - padding) * scale)),
+            max(0, int((rect['y'] - padding) * scale)),
+            min(image.width, int((rect['x'] + rect['width'] + padding) * scale)),
+            min(image.height, int((rect['y'] + rect['height'] + padding) * scale))
+        )
+        if box[2] <= box[0] or box[3] <= box[1]:
+            continue
+        filename = f"{config.SCREENSHOT_DIR}/{prefix}_{name}_{timestamp}_{uuid.uuid4().hex[:8]}.png"
+        jobs.append(_ENCODER.submit(_save_region, image, box, filename))
+
+    paths = [job.result() for job in jobs]
+    skipped = paths.count(None)
+    if skipped:
+        logger.info(f"Skipped {skipped} near-empty {platform} region(s)")
+    return [path for path in paths if path]
@@ -26,9 +26,135 @@ SHORTENER_DOMAINS = [
 # System configuration
 PIN_DEFAULT = '110001'
 TIMEOUT = 15
+SCRAPE_WAIT = 10  # Seconds to wait for a product page's main element once loaded
 WATERMARK_THRESHOLD = 0.85
 SCREENSHOT_DIR = "screenshots"
 MAX_RETRIES = 3
 
 # Mode configuration
 MODE_ADVANCED = False
+
+# Bulk catalog mode
+BULK_WORKERS = 4
+BULK_RESOLVE_THREADS = 8  # Threads expanding short links ahead of the workers
+BULK_LOOKAHEAD = 1000  # Links read ahead so a throttled platform does not stall the others
+
+# Job queue (bot front-end enqueues, worker.py processes)
+JOB_QUEUE_ENABLED = False
+JOB_QUEUE_PATH = "jobs.db"
+JOB_TIMEOUT = 90  # Seconds a worker holds a job before it is handed out again
+JOB_MAX_ATTEMPTS = 3
+JOB_POLL_INTERVAL = 0.5
+JOB_RESULT_TTL = 3600  # Seconds finished jobs are kept before purging
+WORKER_COUNT = 2
+BOT_DRIVER_POOL_SIZE = 2  # Warm browsers kept by the bot when the job queue is off
+
+# Webhook serving (alternative to polling)
+WEBHOOK_ENABLED = False
+WEBHOOK_URL = ""  # Public HTTPS URL Telegram posts updates to
+WEBHOOK_PATH = "/telegram"
+WEBHOOK_LISTEN = "0.0.0.0"
+WEBHOOK_PORT = 8443
+WEBHOOK_SECRET = ""  # Shared by all replicas; letters, digits, _ and - only
+WEBHOOK_DRAIN_GRACE = 5  # Seconds to answer 503 before the server closes
+WEBHOOK_DRAIN_TIMEOUT = 60  # Seconds to let in-flight scrapes finish on shutdown
+
+# Shared cache (recent scrape results reused across replicas)
+CACHE_PATH = "cache.db"
+CACHE_TTL = 900  # Seconds a scrape result is reused
+
+# Scrape limits per platform: concurrent page loads, new scrapes per second, burst
+# Enforced per process: each bot replica and bulk run applies them in full, so divide
+# by the number of processes sharing an outbound IP
+SCRAPE_LIMITS = {
+    'amazon': {'concurrency': 2, 'rate': 0.5, 'burst': 2},
+    'flipkart': {'concurrency': 3, 'rate': 1.0, 'burst': 3},
+    'meesho': {'concurrency': 6, 'rate': 2.0, 'burst': 6},
+    'myntra': {'concurrency': 3, 'rate': 1.0, 'burst': 3},
+    'ajio': {'concurrency': 3, 'rate': 1.0, 'burst': 3},
+    'snapdeal': {'concurrency': 3, 'rate': 1.0, 'burst': 3},
+    'default': {'concurrency': 4, 'rate': 2.0, 'burst': 4}
+}
+
+# Telegram send limits (messages per second), enforced per process; Telegram's limits
+# are per bot token, so divide by the replica count when running several
+TELEGRAM_GLOBAL_RATE = 25
+TELEGRAM_CHAT_RATE = 1
+TELEGRAM_GROUP_RATE = 20 / 60
+TELEGRAM_SEND_ATTEMPTS = 3
+TELEGRAM_MAX_TRACKED_CHATS = 10000
+
+# Retry and hedging (MAX_RETRIES above is the number of retries after the first attempt)
+RETRY_BASE_DELAY = 1.0  # Seconds; doubles per retry, with full jitter
+RETRY_MAX_DELAY = 10.0
+RETRY_BUDGET = JOB_TIMEOUT - 30  # Seconds of attempts per scrape, leaving the lease time to capture
+HEDGE_ENABLED = False  # Start a second attempt when a scrape passes the platform's p95
+HEDGE_MIN_SAMPLES = 20  # Successful scrapes needed before p95 is trusted
+HEDGE_WINDOW = 200
+HEDGE_MAX_THREADS = 8  # Concurrent hedge attempts (extra browsers on top of SCRAPE_LIMITS)
+CAPTCHA_MARKERS = ['captcha', 'robot check', 'are you a human', 'access denied']
+
+# Per-chat state (last link and result, mode, default pin)
+STATE_PATH = "state.db"
+STATE_CACHE_SIZE = 1000  # Chats kept in memory
+STATE_CACHE_TTL = 5  # Seconds before a cached chat is re-read (replicas may change it)
+STATE_RETENTION = 90 * 24 * 3600  # Seconds an idle chat's state is kept
+
+# Progressive replies
+SCREENSHOT_TIMEOUT = 20  # Seconds to wait for the screenshot after the text is sent
+
+# Stock verification (advanced mode)
+STOCK_MAX_TABS = 6  # Pins checked in parallel tabs of one browser
+STOCK_CACHE_TTL = 1800  # Seconds a (product, pin) answer is reused
+STOCK_UNKNOWN_TTL = 300  # Seconds an unknown answer (or a platform whose selectors failed) is reused
+STOCK_CHECK_BUDGET = 40  # Seconds for a whole multi-pin check, well under JOB_TIMEOUT
+STOCK_CHECK_SELECTORS = {
+    'meesho': {
+        'input': 'input[placeholder*="Pincode"]',
+        'submit': '.pincode-check-button',
+        'result': '.pincode-delivery-message'
+    },
+    'myntra': {
+        'input': 'input.pincode-code',
+        'submit': 'input.pincode-check',
+        'result': '.pincode-serviceabilityTitle'
+    },
+    'amazon': {
+        'input': '#GLUXZipUpdateInput',
+        'submit': '#GLUXZipUpdate',
+        'result': '#mir-layout-DELIVERY_BLOCK'
+    }
+}
+STOCK_UNAVAILABLE_MARKERS = [
+    'not deliverable', 'not available', 'out of stock',
+    'currently unavailable', 'cannot be delivered', 'does not deliver'
+]
+
+# Price history (advanced mode "price optimization")
+PRICE_HISTORY_DIR = "price_history"
+PRICE_HISTORY_DAYS = 30
+PRICE_HISTORY_MIN_COUNT = 3  # Observations needed before claiming "lowest"
+
+# Multi-region capture (sent as one album)
+CAPTURE_REGIONS = {  # Region name -> CSS selector, in album order
+    'meesho': {
+        'product': '.pdp-image-container',
+        'price': '.pdp-price-block',
+        'offer': '.pdp-offer-banner'
+    },
+    'myntra': {
+        'product': '.image-grid-container',
+        'price': '.pdp-price-info',
+        'offer': '.pdp-offers-container'
+    },
+    'amazon': {
+        'product': '#imageBlock',
+        'price': '#corePriceDisplay_desktop_feature_div',
+        'offer': '#vsxoffers_feature_div'
+    }
+}
+CAPTURE_MAX_IMAGES = 10  # Telegram albums hold at most 10 items
+CAPTURE_MAX_HEIGHT = 5000  # CSS pixels captured below the top of the page
+CAPTURE_PADDING = 8
+CAPTURE_MIN_STDDEV = 4.0  # Grayscale spread below which a region counts as empty
+CAPTURE_ENCODE_THREADS = 4
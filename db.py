@@ -0,0 +1,28 @@
+"""
+SQLite connections for the bot's shared stores (job queue, cache, chat state)
+
+Each store is used from several threads (executor threads in the bot, the
+worker loop), and a sqlite3 connection must stay on the thread that opened
+it, so every thread gets its own connection to the database file.
+"""
+
+import sqlite3
+import threading
+
+class ThreadLocalConnection:
+    """Callable returning this thread's connection, opening it on first use"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def __call__(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; write transactions are opened explicitly
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
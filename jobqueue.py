@@ -0,0 +1,152 @@
+"""
+Durable scrape job queue shared by the bot front-end and scraper workers
+
+Jobs live in a SQLite database in WAL mode. A worker claims a job by taking
+a lease on it; if the worker dies or the lease runs out before the job is
+completed, the job becomes visible again and another worker picks it up
+(at-least-once delivery).
+"""
+
+import json
+import time
+import uuid
+import logging
+
+import config
+from db import ThreadLocalConnection
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL DEFAULT 'scrape',
+    link TEXT NOT NULL,
+    pin TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    timeout REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    partial TEXT,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+MIGRATIONS = {
+    'kind': "TEXT NOT NULL DEFAULT 'scrape'",
+    'partial': "TEXT"
+}
+
+class JobQueue:
+    """SQLite-backed job queue with visibility leases"""
+
+    def __init__(self, path=None):
+        self.path = path or config.JOB_QUEUE_PATH
+        self._conn = ThreadLocalConnection(self.path)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        
+        # Queues created by older versions lack some columns
+        columns = [row['name'] for row in conn.execute("PRAGMA table_info(jobs)")]
+        for column, definition in MIGRATIONS.items():
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+
+    def enqueue(self, link, pin_code=config.PIN_DEFAULT, timeout=None, kind='scrape'):
+        """Add a job ('scrape' or 'screenshot') and return its id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, link, pin, status, timeout, created, updated) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, link, pin_code, timeout or config.JOB_TIMEOUT, now, now)
+        )
+        return job_id
+
+    def claim(self, worker_id):
+        """Lease the oldest available job to a worker, or return None"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Jobs whose lease ran out are visible again, unless out of attempts
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Job timed out', updated = ? "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, config.JOB_MAX_ATTEMPTS)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY created LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                "lease_until = ?, worker = ?, updated = ? WHERE id = ?",
+                (now + row['timeout'], worker_id, now, row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        if row['status'] == 'running':
+            logger.warning(f"Job {row['id']} lease expired on {row['worker']}, re-delivering")
+        return dict(row, attempts=row['attempts'] + 1, worker=worker_id)
+
+    # Updates from a worker only apply while it still holds the job, so a
+    # worker whose lease expired cannot overwrite the attempt that replaced it
+
+    def set_partial(self, job_id, worker_id, data):
+        """Publish an intermediate result (extracted data before the screenshot)"""
+        self._conn().execute(
+            "UPDATE jobs SET partial = ?, updated = ? "
+            "WHERE id = ? AND status = 'running' AND worker = ?",
+            (json.dumps(data), time.time(), job_id, worker_id)
+        )
+
+    def complete(self, job_id, worker_id, result):
+        """Store a job's result (None when the link could not be processed)"""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'done', result = ?, lease_until = NULL, updated = ? "
+            "WHERE id = ? AND status = 'running' AND worker = ?",
+            (json.dumps(result), time.time(), job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, worker_id, error):
+        """Record a failed attempt; the job is queued again until attempts run out"""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "error = ?, lease_until = NULL, updated = ? "
+            "WHERE id = ? AND status = 'running' AND worker = ?",
+            (config.JOB_MAX_ATTEMPTS, error, time.time(), job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        """Return a job as a dict with its decoded result, or None"""
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['partial'] = json.loads(job['partial']) if job['partial'] else None
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def purge(self, max_age=3600):
+        """Delete finished jobs older than max_age seconds"""
+        self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+            (time.time() - max_age,)
+        )
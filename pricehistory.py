@@ -0,0 +1,123 @@
+"""
+Compact price history for "price optimization" in advanced mode
+
+Every observed price is appended as a fixed 12-byte record (product id,
+timestamp, price) to one flat file, which is read back as a memory-mapped
+numpy array. Millions of observations cost a few MB, and queries are
+vectorized masks over the whole array, so records need not be in time order
+(processes append concurrently and may backfill older timestamps). Product
+keys map to ids through an append-only text index.
+"""
+
+import os
+import time
+import fcntl
+import logging
+import threading
+
+import numpy as np
+
+import config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+RECORD = np.dtype([('product', '<u4'), ('ts', '<u4'), ('price', '<f4')])
+
+class PriceHistory:
+    """Append-only price observations keyed by canonical product"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or config.PRICE_HISTORY_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self.data_path = os.path.join(self.directory, 'prices.bin')
+        self.index_path = os.path.join(self.directory, 'products.txt')
+        self.lock = threading.Lock()
+        self.ids = {}
+        self.index_offset = 0
+        self.records = np.empty(0, dtype=RECORD)
+
+    def _load_index(self, f):
+        """Read index lines added since the last load (line number = product id)"""
+        f.seek(self.index_offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            self.ids[line[:-1].decode('utf-8')] = len(self.ids)
+            self.index_offset += len(line)
+
+    def product_id(self, key, create=True):
+        """Return the id for a product key, assigning a new one if allowed"""
+        with self.lock:
+            if key in self.ids:
+                return self.ids[key]
+            # The lock file keeps ids unique across processes
+            # Binary mode, since the index is resumed from a byte offset
+            with open(self.index_path, 'ab+') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    self._load_index(f)
+                    if key not in self.ids and create:
+                        f.write(key.encode('utf-8') + b'\n')
+                        f.flush()
+                        self._load_index(f)
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            return self.ids.get(key)
+
+    def record(self, key, price, timestamp=None):
+        """Append one price observation"""
+        record = np.array(
+            [(self.product_id(key), int(timestamp or time.time()), price)], dtype=RECORD
+        )
+        # A single small O_APPEND write is atomic, so processes can share the file
+        with open(self.data_path, 'ab') as f:
+            f.write(record.tobytes())
+
+    def _load_records(self):
+        """Memory-map the records file, remapping only when it has grown"""
+        size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        count = size // RECORD.itemsize
+        with self.lock:
+            if count != len(self.records):
+                self.records = np.memmap(self.data_path, dtype=RECORD, mode='r', shape=(count,))
+            return self.records
+
+    def window(self, key, days=None):
+        """Prices seen for a product in the last `days` days, as a numpy array"""
+        product_id = self.product_id(key, create=False)
+        if product_id is None:
+            return np.empty(0, dtype=np.float32)
+
+        records = self._load_records()
+        cutoff = time.time() - (days or config.PRICE_HISTORY_DAYS) * 86400
+        mask = (records['product'] == product_id) & (records['ts'] >= cutoff)
+        return np.asarray(records['price'][mask])
+
+    def summary(self, key, current_price, days=None):
+        """Compare a price with the product's recent history, or None without history"""
+        days = days or config.PRICE_HISTORY_DAYS
+        prices = self.window(key, days)
+        if prices.size == 0:
+            return None
+        average = float(prices.mean())
+        low, high = float(prices.min()), float(prices.max())
+        return {
+            'days': days,
+            'count': int(prices.size),
+            'min': low,
+            'avg': average,
+            'p25': float(np.percentile(prices, 25)),
+            # Matching the low only counts if the price has actually moved
+            'lowest': current_price < low or (current_price == low and low < high),
+            'change_pct': round((current_price - average) / average * 100, 1)
+        }
+
+_HISTORY = None
+
+def get_history():
+    """Shared PriceHistory for this process"""
+    global _HISTORY
+    if _HISTORY is None:
+        _HISTORY = PriceHistory()
+    return _HISTORY
@@ -0,0 +1,137 @@
+"""
+Retry and hedging policy for scrapes
+
+Scrapers raise RetryableScrapeError for transient failures (timeouts, dead
+browsers, network errors). Those are retried with jittered exponential
+backoff up to config.MAX_RETRIES times, as long as another attempt still
+fits in config.RETRY_BUDGET, which keeps a queued job inside its lease.
+Optionally, a scrape that runs past the platform's observed p95 latency gets
+a second attempt on another browser, and whichever finishes first wins.
+Hedge attempts are not counted against the ScrapeScheduler's per-platform
+cap; config.HEDGE_MAX_THREADS bounds how many run at once, and when all of
+those are busy the scrape simply waits for its first attempt.
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+import config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class RetryableScrapeError(Exception):
+    """A transient scrape failure that is worth another attempt"""
+
+class LatencyTracker:
+    """Rolling window of successful scrape durations per platform"""
+
+    def __init__(self, window=None):
+        self.window = window or config.HEDGE_WINDOW
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def record(self, platform, seconds):
+        """Add one successful scrape duration"""
+        with self.lock:
+            self.samples.setdefault(platform, deque(maxlen=self.window)).append(seconds)
+
+    def p95(self, platform):
+        """Return the platform's p95 latency, or None until there are enough samples"""
+        with self.lock:
+            samples = sorted(self.samples.get(platform, ()))
+        if len(samples) < config.HEDGE_MIN_SAMPLES:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+LATENCY = LatencyTracker()
+# Bounds hedge attempts only; first attempts are already capped by the caller
+_HEDGE_SLOTS = threading.BoundedSemaphore(config.HEDGE_MAX_THREADS)
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given retry number (1-based)"""
+    ceiling = min(config.RETRY_MAX_DELAY, config.RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+def retry_call(func, *args, deadline=None):
+    """Call func, retrying RetryableScrapeError; returns None once retries or time run out"""
+    if deadline is None:
+        deadline = time.monotonic() + config.RETRY_BUDGET
+    # Worst case for one attempt: the page load timeout plus the element wait
+    attempt_time = config.TIMEOUT + config.SCRAPE_WAIT
+    for attempt in range(config.MAX_RETRIES + 1):
+        try:
+            return func(*args)
+        except RetryableScrapeError as e:
+            delay = backoff_delay(attempt + 1)
+            if attempt == config.MAX_RETRIES or time.monotonic() + delay + attempt_time > deadline:
+                logger.error(f"Giving up after {attempt + 1} attempts: {str(e)}")
+                return None
+            logger.warning(f"Retrying in {delay:.1f}s after transient error: {str(e)}")
+            time.sleep(delay)
+
+def _timed_call(platform, deadline, func, *args):
+    """Run a scrape with retries and record its latency when it succeeds"""
+    started = time.monotonic()
+    result = retry_call(func, *args, deadline=deadline)
+    if result is not None:
+        LATENCY.record(platform, time.monotonic() - started)
+    return result
+
+def _start_thread(func, *args, name='scrape', on_exit=None):
+    """Run func on a new thread right away and return a Future for its result"""
+    future = Future()
+    future.set_running_or_notify_cancel()
+
+    def run():
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            if on_exit:
+                on_exit()
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+def hedged_call(platform, func, *args):
+    """Run a scrape with retries, hedging with a second attempt past the p95 latency"""
+    # Both attempts share one budget so hedging cannot outlive a job's lease
+    deadline = time.monotonic() + config.RETRY_BUDGET
+    p95 = LATENCY.p95(platform) if config.HEDGE_ENABLED else None
+    if p95 is None:
+        return _timed_call(platform, deadline, func, *args)
+
+    # The first attempt gets its own thread so it starts now, never queued
+    # behind other scrapes, and the p95 clock measures the scrape itself
+    primary = _start_thread(_timed_call, platform, deadline, func, *args)
+    done, _ = wait([primary], timeout=p95)
+    if done:
+        return primary.result()
+
+    # Skip hedging when every hedge slot is busy, i.e. when already saturated
+    if not _HEDGE_SLOTS.acquire(blocking=False):
+        logger.info(f"{platform} scrape slower than p95 ({p95:.1f}s), no hedge slot free")
+        return primary.result()
+
+    logger.info(f"{platform} scrape slower than p95 ({p95:.1f}s), starting hedge attempt")
+    hedge = _start_thread(_timed_call, platform, deadline, func, *args,
+                          name='scrape-hedge', on_exit=_HEDGE_SLOTS.release)
+    pending = {primary, hedge}
+    result = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"{platform} scrape attempt failed: {str(e)}")
+                continue
+            if result is not None:
+                # The slower attempt finishes in the background and frees its browser
+                return result
+    return result
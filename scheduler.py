@@ -0,0 +1,124 @@
+"""
+Rate limiting for outbound scrapes and Telegram sends
+
+Scrapes are capped per platform (concurrent page loads plus a token bucket
+on how often new ones start). Telegram sends go through per-chat and global
+token buckets, and flood-control RetryAfter errors are waited out instead
+of surfacing to users.
+
+All limits live in this process's memory. Replicas do not coordinate, so
+the configured rates are per replica, not per bot token or source IP.
+"""
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from telegram.error import RetryAfter
+
+import config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Allows `rate` operations per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, tokens=1):
+        """Take tokens and return how many seconds to wait before using them"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Going negative books a future token, which keeps waiters in FIFO order
+        self.tokens -= tokens
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def wait_time(self, tokens=1):
+        """Seconds until `tokens` could be taken, without taking them"""
+        elapsed = time.monotonic() - self.updated
+        available = min(self.capacity, self.tokens + elapsed * self.rate)
+        return max(0, (tokens - available) / self.rate)
+
+    async def acquire(self, tokens=1):
+        """Wait until the tokens are available"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def is_idle(self):
+        """True when the bucket is full again and can be dropped"""
+        elapsed = time.monotonic() - self.updated
+        return self.tokens + elapsed * self.rate >= self.capacity
+
+def platform_bucket(limits, platform):
+    """Build a token bucket from a platform's entry in config.SCRAPE_LIMITS"""
+    settings = limits.get(platform, limits['default'])
+    return TokenBucket(settings['rate'], settings.get('burst'))
+
+class ScrapeScheduler:
+    """Per-platform concurrency caps and start-rate limits for scrapes"""
+
+    def __init__(self, limits=None):
+        self.limits = limits or config.SCRAPE_LIMITS
+        self.semaphores = {}
+        self.buckets = {}
+
+    @asynccontextmanager
+    async def slot(self, platform):
+        """Hold one of the platform's scrape slots for the duration of the block"""
+        if platform not in self.semaphores:
+            settings = self.limits.get(platform, self.limits['default'])
+            self.semaphores[platform] = asyncio.Semaphore(settings['concurrency'])
+            self.buckets[platform] = platform_bucket(self.limits, platform)
+
+        async with self.semaphores[platform]:
+            await self.buckets[platform].acquire()
+            yield
+
+class SendQueue:
+    """Paces Telegram sends to stay under per-chat and global flood limits"""
+
+    def __init__(self):
+        self.global_bucket = TokenBucket(config.TELEGRAM_GLOBAL_RATE)
+        self.chat_buckets = OrderedDict()
+
+    def _chat_bucket(self, chat_id):
+        """Return the bucket for a chat, dropping idle ones past the size cap"""
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            # Negative ids are groups and channels, which Telegram limits harder
+            rate = config.TELEGRAM_GROUP_RATE if chat_id < 0 else config.TELEGRAM_CHAT_RATE
+            bucket = self.chat_buckets[chat_id] = TokenBucket(rate, 1)
+            while len(self.chat_buckets) > config.TELEGRAM_MAX_TRACKED_CHATS:
+                oldest_id, oldest = next(iter(self.chat_buckets.items()))
+                if not oldest.is_idle():
+                    break
+                del self.chat_buckets[oldest_id]
+        self.chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def send(self, chat_id, make_request, cost=1):
+        """Run make_request() (a coroutine factory) within rate limits, retrying on RetryAfter
+
+        cost is the number of messages the request posts (an album counts each photo).
+        """
+        for attempt in range(config.TELEGRAM_SEND_ATTEMPTS):
+            await self._chat_bucket(chat_id).acquire(cost)
+            await self.global_bucket.acquire(cost)
+            try:
+                return await make_request()
+            except RetryAfter as e:
+                if attempt == config.TELEGRAM_SEND_ATTEMPTS - 1:
+                    raise
+                # retry_after is seconds, or a timedelta in newer library versions
+                delay = getattr(e.retry_after, 'total_seconds', lambda: e.retry_after)()
+                logger.warning(f"Flood limit hit for chat {chat_id}, retrying in {delay}s")
+                await asyncio.sleep(delay)
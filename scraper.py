@@ -4,22 +4,38 @@ Web scraping module for the Telegram Product Scraper Bot
 
 import os
 import time
+import uuid
 import logging
+import threading
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import (
+    WebDriverException,
+    TimeoutException,
+    NoSuchElementException,
+    StaleElementReferenceException
+)
 from webdriver_manager.chrome import ChromeDriverManager
 from unshortenit import UnshortenIt
 
-from utils import clean_title, parse_price, get_domain
+from utils import clean_title, parse_price, get_domain, get_platform, product_key
+from retry import RetryableScrapeError, retry_call, hedged_call
+from pricehistory import get_history
+from capture import capture_regions
 import config  # Import config
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Warm driver pool (empty unless a long-running process enables it)
+_DRIVER_POOL = []
+_DRIVER_POOL_SIZE = 0
+_DRIVER_POOL_LOCK = threading.Lock()
+
 def setup_driver():
     """Configure Chrome options for mobile emulation"""
     chrome_options = Options()
@@ -43,6 +59,52 @@ def setup_driver():
         logger.error(f"Failed to initialize WebDriver: {str(e)}")
         return None
 
+def quit_driver(driver):
+    """Quit a driver, ignoring errors from an already dead browser"""
+    if driver:
+        try:
+            driver.quit()
+        except:
+            pass
+
+def enable_driver_pool(size=1):
+    """Keep up to `size` idle drivers warm between scrapes in this process"""
+    global _DRIVER_POOL_SIZE
+    _DRIVER_POOL_SIZE = size
+
+def acquire_driver():
+    """Get a warm driver from the pool, or start a new one"""
+    while True:
+        with _DRIVER_POOL_LOCK:
+            driver = _DRIVER_POOL.pop() if _DRIVER_POOL else None
+        if driver is None:
+            return setup_driver()
+        
+        # Drop browsers that crashed while idle
+        try:
+            driver.current_url
+            return driver
+        except Exception:
+            quit_driver(driver)
+
+def release_driver(driver):
+    """Return a driver to the pool, or quit it if the pool is full or disabled"""
+    if not driver:
+        return
+    with _DRIVER_POOL_LOCK:
+        if len(_DRIVER_POOL) < _DRIVER_POOL_SIZE:
+            _DRIVER_POOL.append(driver)
+            return
+    quit_driver(driver)
+
+def close_driver_pool():
+    """Quit all idle pooled drivers"""
+    with _DRIVER_POOL_LOCK:
+        drivers = list(_DRIVER_POOL)
+        _DRIVER_POOL.clear()
+    for driver in drivers:
+        quit_driver(driver)
+
 def unshorten_url(url):
     """Unshorten URL using multiple methods"""
     try:
@@ -64,10 +126,26 @@ def unshorten_url(url):
         logger.error(f"Error unshortening URL {url}: {str(e)}")
         return url
 
+def resolve_link(link):
+    """Unshorten and clean a link, or return None
+
+    Links already on a product domain are only cleaned, so a URL resolved
+    once (e.g. by the bot to pick a rate limit) costs no second lookup.
+    """
+    from utils import clean_url
+    domain = get_domain(link)
+    if get_platform(link) == 'generic' or any(domain.endswith(d) for d in config.SHORTENER_DOMAINS):
+        link = unshorten_url(link)
+        if not link:
+            return None
+        logger.info(f"Unshortened URL: {link}")
+    return clean_url(link)
+
 def capture_screenshot(driver, prefix="screenshot"):
     """Capture screenshot and save to file"""
     timestamp = int(time.time())
-    filename = f"{config.SCREENSHOT_DIR}/{prefix}_{timestamp}.png"
+    # Unique suffix so parallel workers never overwrite each other's files
+    filename = f"{config.SCREENSHOT_DIR}/{prefix}_{timestamp}_{uuid.uuid4().hex[:8]}.png"
     
     # Take screenshot
     driver.save_screenshot(filename)
@@ -78,23 +156,82 @@ def capture_screenshot(driver, prefix="screenshot"):
     
     return filename
 
-def scrape_meesho(url, pin_code=config.PIN_DEFAULT):
+def capture_images(driver, platform, prefix):
+    """Region screenshots for the platform, falling back to one full screenshot"""
+    try:
+        images = capture_regions(driver, platform, prefix)
+    except Exception as e:
+        logger.warning(f"Region capture failed on {platform}: {str(e)}")
+        images = []
+    return images[:config.CAPTURE_MAX_IMAGES] or [capture_screenshot(driver, prefix)]
+
+def is_captcha_page(driver):
+    """Check whether the site served a captcha/bot check instead of the product"""
+    try:
+        page = f"{driver.current_url} {driver.title}".lower()
+    except Exception:
+        return False
+    return any(marker in page for marker in config.CAPTCHA_MARKERS)
+
+def is_retryable(error):
+    """Timeouts, dead browsers and network errors are transient; missing elements are not"""
+    if isinstance(error, RetryableScrapeError):
+        return True
+    if isinstance(error, (TimeoutException, StaleElementReferenceException)):
+        return True
+    if isinstance(error, NoSuchElementException):
+        return False
+    return isinstance(error, (WebDriverException, ConnectionError, TimeoutError))
+
+def scrape_failed(driver, platform, error):
+    """Raise RetryableScrapeError for transient failures, otherwise log and return None"""
+    # Retrying a captcha only digs the hole deeper
+    if driver and is_captcha_page(driver):
+        logger.warning(f"{platform} served a captcha page, not retrying")
+        return None
+    if is_retryable(error):
+        raise RetryableScrapeError(f"{platform}: {str(error)}") from error
+    logger.error(f"{platform} scraping error: {str(error)}")
+    return None
+
+def wait_for_element(driver, by, selector):
+    """Wait for a page's main element after driver.get() has returned
+
+    A slow page load already raised TimeoutException from driver.get() and is
+    retried. Here the page did load, so a missing element means the layout
+    changed or the product is gone, and another attempt would fail the same way.
+    """
+    try:
+        return WebDriverWait(driver, config.SCRAPE_WAIT).until(
+            EC.presence_of_element_located((by, selector))
+        )
+    except TimeoutException:
+        raise NoSuchElementException(f"{selector} not found on the loaded page") from None
+
+def notify_extracted(on_extracted, data):
+    """Hand extracted product data to a callback without letting it break the scrape"""
+    if not on_extracted:
+        return
+    try:
+        on_extracted(dict(data))
+    except Exception as e:
+        logger.warning(f"on_extracted callback failed: {str(e)}")
+
+def scrape_meesho(url, pin_code=config.PIN_DEFAULT, on_extracted=None):
     """Scrape Meesho product details with screenshots"""
     logger.info(f"Scraping Meesho product: {url}")
     
     driver = None
     try:
-        driver = setup_driver()
+        driver = acquire_driver()
         if not driver:
-            return None
+            raise RetryableScrapeError("Could not start browser")
             
         driver.set_page_load_timeout(config.TIMEOUT)
         
         # Load product page
         driver.get(url)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, '.pdp-product-title'))
-        )
+        wait_for_element(driver, By.CSS_SELECTOR, '.pdp-product-title')
         
         # Extract product details
         title_element = driver.find_element(By.CSS_SELECTOR, '.pdp-product-title')
@@ -115,48 +252,43 @@ def scrape_meesho(url, pin_code=config.PIN_DEFAULT):
             if "disabled" not in size_element.get_attribute("class"):
                 available_sizes.append(size_element.text.strip())
         
-        # Capture screenshots
-        product_screenshot = capture_screenshot(driver, "meesho_product")
-        
-        # Return structured data
-        return {
+        # Structured data, shared as soon as extraction is done
+        data = {
             'platform': 'meesho',
             'title': cleaned_title,
             'price': price_value,
             'sizes': available_sizes,
             'pin': pin_code,
-            'images': [product_screenshot],
+            'images': [],
             'url': url,
             'is_clothing': True
         }
+        notify_extracted(on_extracted, data)
+        
+        # Capture screenshots
+        data['images'] = capture_images(driver, 'meesho', "meesho_product")
+        return data
         
     except Exception as e:
-        logger.error(f"Meesho scraping error: {str(e)}")
-        return None
+        return scrape_failed(driver, "Meesho", e)
     finally:
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
+        release_driver(driver)
 
-def scrape_myntra(url):
+def scrape_myntra(url, on_extracted=None):
     """Scrape Myntra product details"""
     logger.info(f"Scraping Myntra product: {url}")
     
     driver = None
     try:
-        driver = setup_driver()
+        driver = acquire_driver()
         if not driver:
-            return None
+            raise RetryableScrapeError("Could not start browser")
             
         driver.set_page_load_timeout(config.TIMEOUT)
         
         # Load product page
         driver.get(url)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'h1.product-title'))
-        )
+        wait_for_element(driver, By.CSS_SELECTOR, 'h1.product-title')
         
         # Extract product details
         title_element = driver.find_element(By.CSS_SELECTOR, 'h1.product-title')
@@ -177,47 +309,42 @@ def scrape_myntra(url):
             if "disabled" not in size_element.get_attribute("class"):
                 available_sizes.append(size_element.text.strip())
         
-        # Capture screenshot
-        screenshot = capture_screenshot(driver, "myntra_product")
-        
-        # Return structured data
-        return {
+        # Structured data, shared as soon as extraction is done
+        data = {
             'platform': 'myntra',
             'title': cleaned_title,
             'price': price_value,
             'sizes': available_sizes,
-            'images': [screenshot],
+            'images': [],
             'url': url,
             'is_clothing': True
         }
+        notify_extracted(on_extracted, data)
+        
+        # Capture screenshot
+        data['images'] = capture_images(driver, 'myntra', "myntra_product")
+        return data
         
     except Exception as e:
-        logger.error(f"Myntra scraping error: {str(e)}")
-        return None
+        return scrape_failed(driver, "Myntra", e)
     finally:
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
+        release_driver(driver)
 
-def scrape_amazon(url):
+def scrape_amazon(url, on_extracted=None):
     """Scrape Amazon product details"""
     logger.info(f"Scraping Amazon product: {url}")
     
     driver = None
     try:
-        driver = setup_driver()
+        driver = acquire_driver()
         if not driver:
-            return None
+            raise RetryableScrapeError("Could not start browser")
             
         driver.set_page_load_timeout(config.TIMEOUT)
         
         # Load product page
         driver.get(url)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, 'productTitle'))
-        )
+        wait_for_element(driver, By.ID, 'productTitle')
         
         # Extract product details
         title_element = driver.find_element(By.ID, 'productTitle')
@@ -231,266 +358,130 @@ def scrape_amazon(url):
         price = price_element.text.strip()
         price_value = parse_price(price)
         
-        # Capture screenshot
-        screenshot = capture_screenshot(driver, "amazon_product")
-        
-        # Return structured data
-        return {
+        # Structured data, shared as soon as extraction is done
+        data = {
             'platform': 'amazon',
             'title': cleaned_title,
             'price': price_value,
             'sizes': [],
-            'images': [screenshot],
+            'images': [],
             'url': url,
             'is_clothing': 'clothing' in url.lower() or 'fashion' in url.lower()
         }
+        notify_extracted(on_extracted, data)
         
-    except Exception as e:
-        logger.error(f"Amazon scraping error: {str(e)}")
-        return None
-    finally:
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
-
-def process_link(link, pin_code=config.PIN_DEFAULT):
-    """Main link processing function"""
-    logger.info(f"Processing link: {link}")
-    
-    # Unshorten the URL
-    original_url = unshorten_url(link)
-    if not original_url:
-        logger.warning(f"Could not unshorten URL: {link}")
-        return None
-    
-    logger.info(f"Unshortened URL: {original_url}")
-    
-    # Clean URL (remove tracking parameters)
-    from utils import clean_url
-    clean_url = clean_url(original_url)
-    logger.info(f"Cleaned URL: {clean_url}")
-    
-    # Determine platform
-    domain = get_domain(clean_url)
-    logger.info(f"Detected domain: {domain}")
-    
-    # Check if domain is supported
-    supported_domains = [d for domains in [
-        list(config.SUPPORTED_DOMAINS.values()), 
-        config.SHORTENER_DOMAINS
-    ] for d in domains]
-    
-    if not any(domain.endswith(supported) for supported in supported_domains):
-        logger.warning(f"Unsupported domain: {domain}")
-        return None
-    
-    # Scrape platform-specific data
-    if 'meesho.com' in domain:
-        return scrape_meesho(clean_url, pin_code)
-    elif 'myntra.com' in domain:
-        return scrape_myntra(clean_url)
-    elif 'amazon.in' in domain:
-        return scrape_amazon(clean_url)
-    else:
-        logger.info(f"No specific scraper for domain: {domain}")
-        # Fallback to generic scraping
-        driver = setup_driver()
-        if not driver:
-            return None
-            
-        try:
-            driver.get(clean_url)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, 'body'))
-            )
-            screenshot = capture_screenshot(driver, "generic_product")
-            
-            return {
-                'platform': 'generic',
-                'title': 'Product',
-                'price': 'Price unavailable',
-                'sizes': [],
-                'images': [screenshot],
-                'url': clean_url,
-                'is_clothing': False
-            }
-        finally:
-            if driver:
-                try:
-                    driver.quit()
-                except:
-                    pass        
-        # Process title (gender first, clean)
-        title = title_element.text.strip()
-        cleaned_title = clean_title(title, is_clothing=True)
-        
-        # Process price
-        price = price_element.text.strip()
-        price_value = parse_price(price)
-        
-        # Process available sizes
-        available_sizes = []
-        for size_element in size_elements:
-            if "disabled" not in size_element.get_attribute("class"):
-                available_sizes.append(size_element.text.strip())
-        
-        # Capture screenshots
-        product_screenshot = capture_screenshot(driver, "meesho_product")
-        
-        # Return structured data
-        return {
-            'platform': 'meesho',
-            'title': cleaned_title,
-            'price': price_value,
-            'sizes': available_sizes,
-            'pin': pin_code,
-            'images': [product_screenshot],
-            'url': url,
-            'is_clothing': True
-        }
+        # Capture screenshot
+        data['images'] = capture_images(driver, 'amazon', "amazon_product")
+        return data
         
     except Exception as e:
-        logger.error(f"Meesho scraping error: {str(e)}")
-        return None
+        return scrape_failed(driver, "Amazon", e)
     finally:
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
+        release_driver(driver)
 
-def scrape_myntra(url):
-    """Scrape Myntra product details"""
-    logger.info(f"Scraping Myntra product: {url}")
-    
+def scrape_generic(url, on_extracted=None):
+    """Screenshot a page from a platform without a dedicated scraper"""
     driver = None
     try:
-        driver = setup_driver()
+        driver = acquire_driver()
         if not driver:
-            return None
+            raise RetryableScrapeError("Could not start browser")
             
-        driver.set_page_load_timeout(TIMEOUT)
-        
-        # Load product page
+        driver.set_page_load_timeout(config.TIMEOUT)
         driver.get(url)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'h1.product-title'))
-        )
-        
-        # Extract product details
-        title_element = driver.find_element(By.CSS_SELECTOR, 'h1.product-title')
-        price_element = driver.find_element(By.CSS_SELECTOR, 'span.product-price')
-        size_elements = driver.find_elements(By.CSS_SELECTOR, 'div.size-selector span')
-        
-        # Process title
-        title = title_element.text.strip()
-        cleaned_title = clean_title(title, is_clothing=True)
-        
-        # Process price
-        price = price_element.text.strip()
-        price_value = parse_price(price)
-        
-        # Process available sizes
-        available_sizes = []
-        for size_element in size_elements:
-            if "disabled" not in size_element.get_attribute("class"):
-                available_sizes.append(size_element.text.strip())
-        
-        # Capture screenshot
-        screenshot = capture_screenshot(driver, "myntra_product")
-        
-        # Return structured data
-        return {
-            'platform': 'myntra',
-            'title': cleaned_title,
-            'price': price_value,
-            'sizes': available_sizes,
-            'images': [screenshot],
+        wait_for_element(driver, By.TAG_NAME, 'body')
+        data = {
+            'platform': 'generic',
+            'title': 'Product',
+            'price': 'Price unavailable',
+            'sizes': [],
+            'images': [],
             'url': url,
-            'is_clothing': True
+            'is_clothing': False
         }
+        notify_extracted(on_extracted, data)
+        
+        data['images'] = capture_images(driver, 'generic', "generic_product")
+        return data
         
     except Exception as e:
-        logger.error(f"Myntra scraping error: {str(e)}")
-        return None
+        return scrape_failed(driver, "Generic", e)
     finally:
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
+        release_driver(driver)
 
-def scrape_amazon(url):
-    """Scrape Amazon product details"""
-    logger.info(f"Scraping Amazon product: {url}")
-    
+def capture_page(url, platform):
+    """Reload a product page and capture a fresh screenshot, skipping extraction"""
     driver = None
     try:
-        driver = setup_driver()
+        driver = acquire_driver()
         if not driver:
-            return None
+            raise RetryableScrapeError("Could not start browser")
             
-        driver.set_page_load_timeout(TIMEOUT)
-        
-        # Load product page
+        driver.set_page_load_timeout(config.TIMEOUT)
         driver.get(url)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, 'productTitle'))
-        )
-        
-        # Extract product details
-        title_element = driver.find_element(By.ID, 'productTitle')
-        price_element = driver.find_element(By.XPATH, '//span[contains(@class, "a-price-whole")]')
-        
-        # Process title
-        title = title_element.text.strip()
-        cleaned_title = clean_title(title, is_clothing=False)
-        
-        # Process price
-        price = price_element.text.strip()
-        price_value = parse_price(price)
-        
-        # Capture screenshot
-        screenshot = capture_screenshot(driver, "amazon_product")
-        
-        # Return structured data
-        return {
-            'platform': 'amazon',
-            'title': cleaned_title,
-            'price': price_value,
-            'sizes': [],
-            'images': [screenshot],
-            'url': url,
-            'is_clothing': 'clothing' in url.lower() or 'fashion' in url.lower()
-        }
+        wait_for_element(driver, By.TAG_NAME, 'body')
+        return capture_images(driver, platform, f"{platform}_product")
         
     except Exception as e:
-        logger.error(f"Amazon scraping error: {str(e)}")
-        return None
+        return scrape_failed(driver, platform.capitalize(), e)
     finally:
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
-
-def process_link(link, pin_code="110001"):
-    """Main link processing function"""
+        release_driver(driver)
+
+def recapture_screenshots(url):
+    """Fresh screenshots for an already processed (clean) product URL"""
+    logger.info(f"Recapturing screenshots: {url}")
+    return retry_call(capture_page, url, get_platform(url))
+
+def price_number(data):
+    """Numeric price from scraped data, or None when unavailable"""
+    try:
+        return float(data['price'])
+    except (TypeError, ValueError):
+        return None
+
+def attach_price_history(data, key):
+    """Add a summary of the product's recent prices to scraped data"""
+    price = price_number(data)
+    if price is None:
+        return
+    try:
+        data['price_history'] = get_history().summary(key, price)
+    except Exception as e:
+        logger.warning(f"Price history lookup failed for {key}: {str(e)}")
+
+def record_price(data, key):
+    """Append the scraped price to the product's history"""
+    price = price_number(data)
+    if price is None:
+        return
+    try:
+        get_history().record(key, price)
+    except Exception as e:
+        logger.warning(f"Could not record price for {key}: {str(e)}")
+
+def run_job(kind, link, pin_code=config.PIN_DEFAULT, on_extracted=None):
+    """Run a queued job: a full 'scrape' of a link, a 'screenshot' refresh,
+    or a 'stock' check (pin_code then holds comma-separated pins)"""
+    if kind == 'screenshot':
+        return recapture_screenshots(link)
+    if kind == 'stock':
+        from stock import check_stock
+        return retry_call(check_stock, link, pin_code.split(','))
+    return process_link(link, pin_code, on_extracted)
+
+def process_link(link, pin_code=config.PIN_DEFAULT, on_extracted=None):
+    """Main link processing function
+
+    on_extracted, if given, is called with the product data (without images)
+    as soon as extraction finishes, before the screenshot is captured.
+    """
     logger.info(f"Processing link: {link}")
     
-    # Unshorten the URL
-    original_url = unshorten_url(link)
-    if not original_url:
+    # Unshorten the URL and remove tracking parameters
+    clean_url = resolve_link(link)
+    if not clean_url:
         logger.warning(f"Could not unshorten URL: {link}")
         return None
-    
-    logger.info(f"Unshortened URL: {original_url}")
-    
-    # Clean URL (remove tracking parameters)
-    from utils import clean_url
-    clean_url = clean_url(original_url)
     logger.info(f"Cleaned URL: {clean_url}")
     
     # Determine platform
@@ -507,22 +498,28 @@ def process_link(link, pin_code="110001"):
         logger.warning(f"Unsupported domain: {domain}")
         return None
     
-    # Scrape platform-specific data
+    # Early (extracted) data gets the price history summary too
+    history_key = product_key(clean_url)
+    extracted = None
+    if on_extracted:
+        def extracted(data):
+            attach_price_history(data, history_key)
+            on_extracted(data)
+    
+    # Scrape platform-specific data (with retries and optional hedging)
     if 'meesho.com' in domain:
-        return scrape_meesho(clean_url, pin_code)
+        result = hedged_call('meesho', scrape_meesho, clean_url, pin_code, extracted)
     elif 'myntra.com' in domain:
-        return scrape_myntra(clean_url)
+        result = hedged_call('myntra', scrape_myntra, clean_url, extracted)
     elif 'amazon.in' in domain:
-        return scrape_amazon(clean_url)
+        result = hedged_call('amazon', scrape_amazon, clean_url, extracted)
     else:
         logger.info(f"No specific scraper for domain: {domain}")
         # Fallback to generic scraping
-        return {
-            'platform': 'generic',
-            'title': 'Product',
-            'price': 'Price unavailable',
-            'sizes': [],
-            'images': [capture_screenshot(setup_driver(), "generic_product")],
-            'url': clean_url,
-            'is_clothing': False
-        }
+        result = hedged_call('generic', scrape_generic, clean_url, extracted)
+    
+    # Summarize against past prices, then add this observation
+    if result:
+        attach_price_history(result, history_key)
+        record_price(result, history_key)
+    return result
@@ -0,0 +1,100 @@
+"""
+Per-chat state store for the Telegram Product Scraper Bot
+
+Keeps each chat's last link and processed result, its mode and its default
+pin code in SQLite (WAL mode) so state survives restarts and is shared by
+replicas. A small LRU in front serves repeat reads; entries expire after
+STATE_CACHE_TTL so changes made by another replica show up quickly.
+"""
+
+import json
+import time
+import threading
+from collections import OrderedDict
+
+import config
+from db import ThreadLocalConnection
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_state (
+    chat_id INTEGER PRIMARY KEY,
+    link TEXT,
+    result TEXT,
+    advanced INTEGER,
+    pin TEXT,
+    updated REAL NOT NULL
+);
+"""
+
+FIELDS = ('link', 'result', 'advanced', 'pin')
+
+class StateStore:
+    """SQLite-backed chat state with a bounded in-memory LRU"""
+
+    def __init__(self, path=None, capacity=None):
+        self.path = path or config.STATE_PATH
+        self.capacity = capacity or config.STATE_CACHE_SIZE
+        self._conn = ThreadLocalConnection(self.path)
+        self._lru = OrderedDict()  # chat_id -> (loaded_at, state)
+        self._lock = threading.Lock()
+        self._conn().executescript(SCHEMA)
+
+    def _remember(self, chat_id, state):
+        """Put a state in the LRU, evicting the least recently used past capacity"""
+        with self._lock:
+            self._lru[chat_id] = (time.monotonic(), state)
+            self._lru.move_to_end(chat_id)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+
+    def get(self, chat_id):
+        """Return a chat's state, filling in defaults for unset fields"""
+        with self._lock:
+            entry = self._lru.get(chat_id)
+            if entry and time.monotonic() - entry[0] < config.STATE_CACHE_TTL:
+                self._lru.move_to_end(chat_id)
+                return dict(entry[1])
+
+        row = self._conn().execute(
+            "SELECT link, result, advanced, pin FROM chat_state WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+        link, result, advanced, pin = row or (None, None, None, None)
+        state = {
+            'link': link,
+            'result': json.loads(result) if result else None,
+            'advanced': config.MODE_ADVANCED if advanced is None else bool(advanced),
+            'pin': pin or config.PIN_DEFAULT
+        }
+        self._remember(chat_id, state)
+        return dict(state)
+
+    def update(self, chat_id, **fields):
+        """Set some of a chat's fields (link, result, advanced, pin)"""
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown state fields: {', '.join(sorted(unknown))}")
+
+        values = dict(fields)
+        if 'result' in values:
+            values['result'] = json.dumps(values['result']) if values['result'] else None
+        if 'advanced' in values:
+            values['advanced'] = int(values['advanced'])
+
+        columns = ', '.join(values)
+        placeholders = ', '.join('?' for _ in values)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in values)
+        self._conn().execute(
+            f"INSERT INTO chat_state (chat_id, {columns}, updated) VALUES (?, {placeholders}, ?) "
+            f"ON CONFLICT (chat_id) DO UPDATE SET {updates}, updated = excluded.updated",
+            (chat_id, *values.values(), time.time())
+        )
+
+        # Drop the cached copy rather than patch it, so the next read sees the stored row
+        with self._lock:
+            self._lru.pop(chat_id, None)
+
+    def purge(self, max_age):
+        """Delete state for chats idle longer than max_age seconds"""
+        self._conn().execute(
+            "DELETE FROM chat_state WHERE updated < ?", (time.time() - max_age,)
+        )
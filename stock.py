@@ -0,0 +1,158 @@
+"""
+Multi-pin stock verification for the Telegram Product Scraper Bot
+
+Checks delivery availability for several pin codes in one warm browser:
+every pin gets its own tab, the tabs are opened together so the pages load
+concurrently, and the driver then steps through them to submit each pin
+and read the answer. The whole check shares one deadline
+(config.STOCK_CHECK_BUDGET), so a broken page costs one budget, not a wait
+per pin. Results per (product, pin) are kept in the shared cache, unknown
+ones briefly, and a platform whose selectors stop matching is skipped for a
+while.
+"""
+
+import time
+import logging
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+import config
+from cache import SharedCache
+from retry import RetryableScrapeError
+from utils import get_platform
+from scraper import acquire_driver, release_driver
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+_CACHE = None
+
+def _cache():
+    """Open the shared cache on first use"""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = SharedCache()
+    return _CACHE
+
+def _open_tabs(driver, url, pins):
+    """Open one tab per pin without waiting for any of them to load"""
+    handles = {}
+    for pin in pins:
+        before = set(driver.window_handles)
+        driver.execute_script("window.open(arguments[0], '_blank');", url)
+        handles[pin] = (set(driver.window_handles) - before).pop()
+    return handles
+
+def _remaining(deadline):
+    """Seconds left before the check's deadline, capped at one page timeout"""
+    return min(config.TIMEOUT, deadline - time.monotonic())
+
+def _read_availability(driver, selectors, deadline):
+    """Interpret the delivery message shown after submitting a pin"""
+    message = WebDriverWait(driver, _remaining(deadline)).until(
+        EC.visibility_of_element_located((By.CSS_SELECTOR, selectors['result']))
+    ).text.lower()
+    return not any(marker in message for marker in config.STOCK_UNAVAILABLE_MARKERS)
+
+def _check_in_tabs(driver, url, pins, selectors, deadline):
+    """Check a batch of pins in parallel tabs; unknown results are None
+
+    Also returns False when the selectors look broken: pins were tried and
+    none of them could be submitted.
+    """
+    results = {}
+    submitted = False
+    submit_failed = False
+    main_handle = driver.current_window_handle
+    handles = _open_tabs(driver, url, pins)
+    try:
+        # Submit every pin first so the checks run in the background together
+        for pin, handle in handles.items():
+            if _remaining(deadline) <= 0:
+                results[pin] = None
+                continue
+            driver.switch_to.window(handle)
+            try:
+                field = WebDriverWait(driver, _remaining(deadline)).until(
+                    EC.element_to_be_clickable((By.CSS_SELECTOR, selectors['input']))
+                )
+                field.clear()
+                field.send_keys(pin)
+                driver.find_element(By.CSS_SELECTOR, selectors['submit']).click()
+                submitted = True
+            except Exception as e:
+                logger.warning(f"Could not submit pin {pin} for {url}: {str(e)}")
+                results[pin] = None
+                submit_failed = True
+
+        for pin, handle in handles.items():
+            if pin in results:
+                continue
+            if _remaining(deadline) <= 0:
+                results[pin] = None
+                continue
+            driver.switch_to.window(handle)
+            try:
+                results[pin] = _read_availability(driver, selectors, deadline)
+            except Exception as e:
+                logger.warning(f"No delivery answer for pin {pin} on {url}: {str(e)}")
+                results[pin] = None
+    finally:
+        for handle in handles.values():
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+            except Exception:
+                pass
+        driver.switch_to.window(main_handle)
+    return results, submitted or not submit_failed
+
+def check_stock(url, pins):
+    """Return {pin: True/False/None} delivery availability for a clean product URL"""
+    platform = get_platform(url)
+    selectors = config.STOCK_CHECK_SELECTORS.get(platform)
+    if not selectors:
+        return {pin: None for pin in pins}
+
+    cache = _cache()
+    if cache.get(f"stock:broken:{platform}"):
+        return {pin: None for pin in pins}
+
+    results = {}
+    missing = []
+    for pin in pins:
+        cached = cache.get(f"stock:{pin}:{url}")
+        if cached is None:
+            missing.append(pin)
+        else:
+            results[pin] = cached['available']
+
+    if missing:
+        logger.info(f"Checking stock on {platform} for pins {', '.join(missing)}: {url}")
+        driver = acquire_driver()
+        if not driver:
+            raise RetryableScrapeError("Could not start browser")
+        deadline = time.monotonic() + config.STOCK_CHECK_BUDGET
+        try:
+            driver.set_page_load_timeout(config.TIMEOUT)
+            for start in range(0, len(missing), config.STOCK_MAX_TABS):
+                if _remaining(deadline) <= 0:
+                    break
+                batch = missing[start:start + config.STOCK_MAX_TABS]
+                answers, selectors_ok = _check_in_tabs(driver, url, batch, selectors, deadline)
+                for pin, available in answers.items():
+                    results[pin] = available
+                    # Unknown answers are kept briefly so repeats don't pay the wait again
+                    ttl = config.STOCK_CACHE_TTL if available is not None else config.STOCK_UNKNOWN_TTL
+                    cache.set(f"stock:{pin}:{url}", {'available': available}, ttl)
+                if not selectors_ok:
+                    # The pin field never showed up: the selectors no longer match
+                    logger.warning(f"Stock check selectors failed on {platform}, skipping it for now")
+                    cache.set(f"stock:broken:{platform}", True, config.STOCK_UNKNOWN_TTL)
+                    break
+        finally:
+            release_driver(driver)
+
+    return {pin: results.get(pin) for pin in pins}
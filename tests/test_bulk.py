@@ -0,0 +1,48 @@
+"""Tests for bulk scheduling across platforms"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bulk
+import config
+import scraper
+
+def fake_process(link, url, pin_code):
+    time.sleep(0.05)
+    return {'link': link, 'ok': True, 'finished': time.monotonic()}
+
+def run(tmp_path, monkeypatch, links, limits):
+    monkeypatch.setattr(config, 'SCRAPE_LIMITS', limits)
+    monkeypatch.setattr(scraper, 'resolve_link', lambda link: link)
+    monkeypatch.setattr(bulk, '_process', fake_process)
+    # Threads stand in for worker processes; scheduling is the same
+    monkeypatch.setattr(bulk, '_new_pool', lambda workers: ThreadPoolExecutor(workers))
+    output = tmp_path / 'out.jsonl'
+    stats = bulk.run_bulk(iter(links), str(output), workers=4)
+    return stats, [json.loads(line) for line in output.read_text().splitlines()]
+
+def test_throttled_platform_does_not_block_others(tmp_path, monkeypatch):
+    amazon = [f"https://www.amazon.in/dp/B{i}" for i in range(3)]
+    meesho = [f"https://www.meesho.com/item/p/{i}" for i in range(6)]
+    limits = {
+        'amazon': {'concurrency': 1, 'rate': 2.0, 'burst': 1},
+        'default': {'concurrency': 4, 'rate': 100.0, 'burst': 100}
+    }
+    stats, records = run(tmp_path, monkeypatch, amazon + meesho, limits)
+
+    assert stats == {'ok': 9, 'failed': 0, 'skipped': 0}
+    finished = {record['link']: record['finished'] for record in records}
+    # The last Amazon link waits about a second for tokens; Meesho does not wait for it
+    assert max(finished[link] for link in meesho) < finished[amazon[-1]]
+    # Within a platform, input order is kept
+    assert [finished[link] for link in amazon] == sorted(finished[link] for link in amazon)
+
+def test_failed_resolution_is_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, 'resolve_link', lambda link: None)
+    monkeypatch.setattr(bulk, '_new_pool', lambda workers: ThreadPoolExecutor(workers))
+    output = tmp_path / 'out.jsonl'
+    stats = bulk.run_bulk(iter(["https://cutt.ly/x", "https://cutt.ly/x"]), str(output))
+
+    assert stats == {'ok': 0, 'failed': 1, 'skipped': 1}
+    assert json.loads(output.read_text())['error'] == "Could not unshorten link"
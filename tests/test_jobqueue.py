@@ -0,0 +1,84 @@
+"""Tests for the SQLite job queue leases and re-delivery"""
+
+import time
+
+import config
+from jobqueue import JobQueue
+
+def make_queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'))
+
+def test_claim_returns_oldest_job_once(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.enqueue('https://www.meesho.com/a/p/1')
+    queue.enqueue('https://www.meesho.com/b/p/2')
+
+    job = queue.claim('worker-a')
+    assert job['id'] == first
+    assert job['attempts'] == 1
+    assert job['worker'] == 'worker-a'
+    assert queue.claim('worker-b')['id'] != first
+    assert queue.claim('worker-c') is None
+
+def test_complete_stores_result(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue('https://www.myntra.com/1')
+    queue.claim('worker-a')
+
+    assert queue.complete(job_id, 'worker-a', {'title': 'Shirt'})
+    job = queue.get(job_id)
+    assert job['status'] == 'done'
+    assert job['result'] == {'title': 'Shirt'}
+
+def test_fail_requeues_until_attempts_run_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'JOB_MAX_ATTEMPTS', 2)
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue('https://www.amazon.in/dp/B0')
+
+    queue.claim('worker-a')
+    assert queue.fail(job_id, 'worker-a', 'boom')
+    assert queue.get(job_id)['status'] == 'queued'
+
+    assert queue.claim('worker-b')['attempts'] == 2
+    queue.fail(job_id, 'worker-b', 'boom again')
+    job = queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'boom again'
+    assert queue.claim('worker-c') is None
+
+def test_expired_lease_is_redelivered(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue('https://www.meesho.com/a/p/1', timeout=0.05)
+    queue.claim('worker-a')
+    assert queue.claim('worker-b') is None
+
+    time.sleep(0.1)
+    job = queue.claim('worker-b')
+    assert job['id'] == job_id
+    assert job['attempts'] == 2
+
+def test_stale_worker_cannot_touch_redelivered_job(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue('https://www.meesho.com/a/p/1', timeout=0.05)
+    queue.claim('worker-a')
+    time.sleep(0.1)
+    queue.claim('worker-b')
+
+    assert not queue.fail(job_id, 'worker-a', 'late failure')
+    assert not queue.complete(job_id, 'worker-a', {'title': 'late'})
+    assert queue.get(job_id)['status'] == 'running'
+
+    assert queue.complete(job_id, 'worker-b', {'title': 'fresh'})
+    assert queue.get(job_id)['result'] == {'title': 'fresh'}
+
+def test_lease_expiry_after_last_attempt_fails_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'JOB_MAX_ATTEMPTS', 1)
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue('https://www.meesho.com/a/p/1', timeout=0.05)
+    queue.claim('worker-a')
+    time.sleep(0.1)
+
+    assert queue.claim('worker-b') is None
+    job = queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Job timed out'
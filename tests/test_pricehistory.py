@@ -0,0 +1,75 @@
+"""Tests for the memory-mapped price history"""
+
+import time
+
+from pricehistory import PriceHistory
+
+DAY = 86400
+
+def test_window_filters_product_and_age(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    now = time.time()
+    history.record('meesho:/kurta/p/1', 500, now - 2 * DAY)
+    history.record('meesho:/saree/p/2', 900, now - DAY)
+    history.record('meesho:/kurta/p/1', 450, now - 40 * DAY)
+    history.record('meesho:/kurta/p/1', 480, now)
+
+    assert sorted(history.window('meesho:/kurta/p/1', days=30)) == [480, 500]
+    assert sorted(history.window('meesho:/kurta/p/1', days=60)) == [450, 480, 500]
+
+def test_window_does_not_need_time_order(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    now = time.time()
+    history.record('amazon:/dp/B01', 100, now)
+    history.record('amazon:/dp/B01', 50, now - 90 * DAY)
+    history.record('amazon:/dp/B01', 120, now - DAY)
+
+    assert sorted(history.window('amazon:/dp/B01', days=30)) == [100, 120]
+
+def test_unknown_product_has_empty_window(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    assert history.window('myntra:/1').size == 0
+    assert history.summary('myntra:/1', 100) is None
+
+def test_ids_are_shared_across_instances(tmp_path):
+    first = PriceHistory(str(tmp_path))
+    first.record('myntra:/kurta-ünïcode/1', 799)
+    first.record('myntra:/2', 999)
+
+    second = PriceHistory(str(tmp_path))
+    assert second.product_id('myntra:/2', create=False) == 1
+    second.record('myntra:/3', 199)
+    assert first.product_id('myntra:/3', create=False) == 2
+    assert list(second.window('myntra:/kurta-ünïcode/1')) == [799]
+
+def test_summary_flags_lowest_price(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    now = time.time()
+    for days_ago, price in [(3, 600), (2, 500), (1, 400)]:
+        history.record('meesho:/1', price, now - days_ago * DAY)
+
+    summary = history.summary('meesho:/1', 380, days=30)
+    assert summary['count'] == 3
+    assert summary['lowest'] is True
+    assert summary['avg'] == 500
+    assert summary['change_pct'] == -24.0
+
+def test_flat_price_is_not_lowest(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    now = time.time()
+    for days_ago in (3, 2, 1):
+        history.record('meesho:/1', 500, now - days_ago * DAY)
+
+    summary = history.summary('meesho:/1', 500)
+    assert summary['lowest'] is False
+    assert summary['change_pct'] == 0
+    assert history.summary('meesho:/1', 499)['lowest'] is True
+
+def test_matching_earlier_low_is_lowest(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    now = time.time()
+    for days_ago, price in [(3, 450), (2, 500), (1, 520)]:
+        history.record('meesho:/1', price, now - days_ago * DAY)
+
+    assert history.summary('meesho:/1', 450)['lowest'] is True
+    assert history.summary('meesho:/1', 451)['lowest'] is False
@@ -0,0 +1,146 @@
+"""Tests for scrape retries, latency tracking and hedging"""
+
+import time
+import threading
+
+import pytest
+
+import config
+import retry
+from retry import RetryableScrapeError, LatencyTracker, retry_call, hedged_call
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(config, 'RETRY_BASE_DELAY', 0.001)
+    monkeypatch.setattr(config, 'RETRY_MAX_DELAY', 0.001)
+    monkeypatch.setattr(config, 'MAX_RETRIES', 3)
+
+class Flaky:
+    """Raises RetryableScrapeError a given number of times, then succeeds"""
+
+    def __init__(self, failures, result='ok'):
+        self.failures = failures
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RetryableScrapeError("transient")
+        return self.result
+
+def test_retry_call_retries_transient_errors():
+    flaky = Flaky(failures=2)
+    assert retry_call(flaky) == 'ok'
+    assert flaky.calls == 3
+
+def test_retry_call_gives_up_after_max_retries():
+    flaky = Flaky(failures=10)
+    assert retry_call(flaky) is None
+    assert flaky.calls == config.MAX_RETRIES + 1
+
+def test_retry_call_stops_when_attempt_would_overrun_deadline(monkeypatch):
+    monkeypatch.setattr(config, 'TIMEOUT', 1)
+    monkeypatch.setattr(config, 'SCRAPE_WAIT', 1)
+    flaky = Flaky(failures=10)
+    assert retry_call(flaky, deadline=time.monotonic() + 1) is None
+    assert flaky.calls == 1
+
+def test_retry_call_does_not_retry_other_errors():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("bad page")
+    with pytest.raises(ValueError):
+        retry_call(broken)
+    assert len(calls) == 1
+
+def test_p95_needs_enough_samples(monkeypatch):
+    monkeypatch.setattr(config, 'HEDGE_MIN_SAMPLES', 20)
+    tracker = LatencyTracker(window=100)
+    for seconds in range(1, 20):
+        tracker.record('meesho', seconds)
+    assert tracker.p95('meesho') is None
+    for seconds in range(20, 101):
+        tracker.record('meesho', seconds)
+    assert tracker.p95('meesho') == 95
+    assert tracker.p95('amazon') is None
+
+def test_p95_uses_rolling_window(monkeypatch):
+    monkeypatch.setattr(config, 'HEDGE_MIN_SAMPLES', 1)
+    tracker = LatencyTracker(window=10)
+    for _ in range(10):
+        tracker.record('myntra', 100)
+    for _ in range(10):
+        tracker.record('myntra', 1)
+    assert tracker.p95('myntra') == 1
+
+@pytest.fixture
+def hedging(monkeypatch):
+    """Enable hedging with a known p95 of 0.1s for 'meesho'"""
+    monkeypatch.setattr(config, 'HEDGE_ENABLED', True)
+    monkeypatch.setattr(config, 'HEDGE_MIN_SAMPLES', 1)
+    tracker = LatencyTracker()
+    tracker.record('meesho', 0.1)
+    monkeypatch.setattr(retry, 'LATENCY', tracker)
+
+    def set_slots(count):
+        monkeypatch.setattr(retry, '_HEDGE_SLOTS', threading.BoundedSemaphore(count))
+    set_slots(2)
+    return set_slots
+
+class Recorder:
+    """Scrape stand-in that sleeps per call and tracks how many run at once"""
+
+    def __init__(self, durations):
+        self.durations = list(durations)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.starts = []
+
+    def __call__(self):
+        with self.lock:
+            duration = self.durations.pop(0) if self.durations else 0.3
+            self.starts.append(time.monotonic())
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(duration)
+        with self.lock:
+            self.running -= 1
+        return duration
+
+def test_hedge_wins_when_first_attempt_is_slow(hedging):
+    scrape = Recorder([1.0, 0.05])
+    started = time.monotonic()
+    assert hedged_call('meesho', scrape) == 0.05
+    assert time.monotonic() - started < 0.5
+    assert len(scrape.starts) == 2
+
+def test_no_hedge_without_latency_history(hedging):
+    scrape = Recorder([0.2])
+    assert hedged_call('amazon', scrape) == 0.2
+    assert len(scrape.starts) == 1
+
+def test_first_attempts_are_not_capped_by_hedge_slots(hedging):
+    hedging(1)
+    scrape = Recorder([0.3] * 12)
+    threads = [threading.Thread(target=hedged_call, args=('meesho', scrape)) for _ in range(6)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # All six first attempts start together; at most one hedge joins them
+    first_starts = sorted(scrape.starts)[:6]
+    assert first_starts[-1] - started < 0.1
+    assert len(scrape.starts) <= 7
+    assert scrape.peak <= 7
+
+def test_hedge_slot_is_released(hedging):
+    hedging(1)
+    hedged_call('meesho', Recorder([0.3, 0.3]))
+    time.sleep(0.4)
+    assert retry._HEDGE_SLOTS.acquire(blocking=False)
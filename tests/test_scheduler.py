@@ -0,0 +1,52 @@
+"""Tests for the token buckets behind scrape and send rate limits"""
+
+import pytest
+
+from scheduler import TokenBucket
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freeze time.monotonic in the scheduler module; advance with clock.now"""
+    class Clock:
+        now = 1000.0
+    monkeypatch.setattr('scheduler.time.monotonic', lambda: Clock.now)
+    return Clock
+
+def test_burst_is_free_then_waits_queue_up(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # Each further reservation books the next free token, in order
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+def test_tokens_refill_up_to_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2)
+    bucket.reserve()
+    bucket.reserve()
+    clock.now += 60
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1.0)
+
+def test_reserve_several_tokens(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    assert bucket.reserve(3) == pytest.approx(2.0)
+    assert bucket.reserve() == pytest.approx(3.0)
+
+def test_is_idle_once_refilled(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+    assert bucket.is_idle()
+    bucket.reserve()
+    assert not bucket.is_idle()
+    clock.now += 0.5
+    assert bucket.is_idle()
+
+def test_wait_time_does_not_take_tokens(clock):
+    bucket = TokenBucket(rate=2, capacity=1)
+    assert bucket.wait_time() == 0
+    assert bucket.wait_time() == 0
+    bucket.reserve()
+    assert bucket.wait_time() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.wait_time() == 0
@@ -0,0 +1,21 @@
+"""Tests for scrape error classification"""
+
+from selenium.common.exceptions import (
+    WebDriverException, TimeoutException, NoSuchElementException,
+    StaleElementReferenceException
+)
+
+from retry import RetryableScrapeError
+from scraper import is_retryable
+
+def test_transient_errors_are_retryable():
+    assert is_retryable(RetryableScrapeError("browser did not start"))
+    assert is_retryable(TimeoutException("page load timed out"))
+    assert is_retryable(StaleElementReferenceException("re-rendered"))
+    assert is_retryable(WebDriverException("chrome crashed"))
+    assert is_retryable(ConnectionError("reset"))
+
+def test_missing_elements_and_bugs_are_not_retryable():
+    assert not is_retryable(NoSuchElementException(".pdp-product-title"))
+    assert not is_retryable(ValueError("could not parse price"))
+    assert not is_retryable(KeyError('price'))
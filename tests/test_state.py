@@ -0,0 +1,53 @@
+"""Tests for the per-chat state store and its LRU"""
+
+import pytest
+
+import config
+from state import StateStore
+
+def make_store(tmp_path, capacity=2):
+    return StateStore(str(tmp_path / 'state.db'), capacity)
+
+def test_defaults_for_unknown_chat(tmp_path):
+    state = make_store(tmp_path).get(42)
+    assert state == {'link': None, 'result': None,
+                     'advanced': config.MODE_ADVANCED, 'pin': config.PIN_DEFAULT}
+
+def test_update_invalidates_cached_entry(tmp_path):
+    store = make_store(tmp_path)
+    assert store.get(1)['pin'] == config.PIN_DEFAULT
+    store.update(1, pin='560001', result={'title': 'Kurta'})
+    state = store.get(1)
+    assert state['pin'] == '560001'
+    assert state['result'] == {'title': 'Kurta'}
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    store = make_store(tmp_path, capacity=2)
+    store.get(1)
+    store.get(2)
+    store.get(1)
+    store.get(3)
+    assert list(store._lru) == [1, 3]
+
+def test_evicted_state_is_reloaded_from_disk(tmp_path):
+    store = make_store(tmp_path, capacity=1)
+    store.update(1, link='https://www.meesho.com/a/p/1', advanced=True)
+    store.get(1)
+    store.get(2)
+    assert 1 not in store._lru
+
+    state = store.get(1)
+    assert state['link'] == 'https://www.meesho.com/a/p/1'
+    assert state['advanced'] is True
+
+def test_other_store_sees_changes_after_ttl(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'STATE_CACHE_TTL', 0)
+    reader = make_store(tmp_path)
+    writer = make_store(tmp_path)
+    reader.get(1)
+    writer.update(1, pin='400001')
+    assert reader.get(1)['pin'] == '400001'
+
+def test_update_rejects_unknown_fields(tmp_path):
+    with pytest.raises(ValueError):
+        make_store(tmp_path).update(1, color='red')
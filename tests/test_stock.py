@@ -0,0 +1,81 @@
+"""Tests for multi-pin stock checks: shared deadline and caching"""
+
+import time
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+
+import config
+import stock
+from cache import SharedCache
+
+URL = "https://www.meesho.com/kurta/p/1"
+
+class BrokenPageDriver:
+    """Browser stand-in whose pages never show the pin code field"""
+
+    def __init__(self):
+        self.window_handles = ['main']
+        self.current_window_handle = 'main'
+        self.switch_to = self
+        self.loads = 0
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def execute_script(self, script, url):
+        self.window_handles.append(f"tab{len(self.window_handles)}")
+        self.loads += 1
+
+    def window(self, handle):
+        self.current_window_handle = handle
+
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+
+    def find_element(self, by, selector):
+        raise NoSuchElementException(selector)
+
+@pytest.fixture
+def driver(tmp_path, monkeypatch):
+    driver = BrokenPageDriver()
+    monkeypatch.setattr(stock, '_CACHE', SharedCache(str(tmp_path / 'cache.db')))
+    monkeypatch.setattr(stock, 'acquire_driver', lambda: driver)
+    monkeypatch.setattr(stock, 'release_driver', lambda driver: None)
+    monkeypatch.setattr(config, 'STOCK_CHECK_BUDGET', 1)
+    return driver
+
+def test_batch_shares_one_deadline(driver):
+    pins = ['110001', '560001', '400001', '700001', '600001', '500001', '302001']
+    started = time.monotonic()
+    assert stock.check_stock(URL, pins) == {pin: None for pin in pins}
+    # Without a shared deadline this is TIMEOUT per pin
+    assert time.monotonic() - started < 3
+    # The second batch is never opened once the budget is spent
+    assert driver.loads == config.STOCK_MAX_TABS
+    assert driver.window_handles == ['main']
+
+def test_broken_selectors_skip_platform(driver):
+    stock.check_stock(URL, ['110001'])
+    started = time.monotonic()
+    assert stock.check_stock("https://www.meesho.com/saree/p/2", ['560001']) == {'560001': None}
+    assert time.monotonic() - started < 0.1
+    assert driver.loads == 1
+
+def test_unknown_answers_are_cached_briefly(driver, monkeypatch):
+    monkeypatch.setattr(stock, '_check_in_tabs',
+                        lambda driver, url, pins, selectors, deadline: ({pin: None for pin in pins}, True))
+    stock.check_stock(URL, ['110001'])
+    monkeypatch.setattr(stock, 'acquire_driver', lambda: pytest.fail("should use the cache"))
+    assert stock.check_stock(URL, ['110001']) == {'110001': None}
+
+def test_definite_answers_are_cached(driver, monkeypatch):
+    monkeypatch.setattr(stock, '_check_in_tabs',
+                        lambda driver, url, pins, selectors, deadline: ({pins[0]: True, pins[1]: False}, True))
+    stock.check_stock(URL, ['110001', '560001'])
+    monkeypatch.setattr(stock, 'acquire_driver', lambda: pytest.fail("should use the cache"))
+    assert stock.check_stock(URL, ['560001', '110001']) == {'560001': False, '110001': True}
+
+def test_platform_without_selectors(driver):
+    assert stock.check_stock("https://www.snapdeal.com/p/1", ['110001']) == {'110001': None}
+    assert driver.loads == 0
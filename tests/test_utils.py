@@ -0,0 +1,37 @@
+"""Tests for output formatting helpers"""
+
+from pricehistory import PriceHistory
+from utils import format_stock, format_price_history
+
+def test_format_stock_marks_each_pin():
+    line = format_stock({'110001': True, '560001': False, '400001': None})
+    assert line == "Stock - 110001 ✅, 560001 ❌, 400001 ❔"
+
+def test_format_stock_keeps_pin_order():
+    assert format_stock({'560001': True, '110001': True}) == "Stock - 560001 ✅, 110001 ✅"
+
+def history(**fields):
+    summary = {'days': 30, 'count': 5, 'min': 400.0, 'avg': 500.0, 'p25': 450.0,
+               'lowest': False, 'change_pct': 0.0}
+    summary.update(fields)
+    return summary
+
+def test_price_history_lowest():
+    assert format_price_history(history(lowest=True)) == "📉 Lowest in 30 days"
+
+def test_price_history_lowest_needs_enough_observations():
+    verdict = format_price_history(history(lowest=True, count=2, change_pct=-20.0))
+    assert verdict == "📉 Price dropped 20% (30-day avg 500 rs)"
+
+def test_price_history_drop():
+    assert format_price_history(history(change_pct=-12.4)) == "📉 Price dropped 12% (30-day avg 500 rs)"
+
+def test_price_history_unremarkable():
+    assert format_price_history(history(change_pct=-0.5)) == ''
+    assert format_price_history(history(change_pct=8.0)) == ''
+
+def test_flat_history_gives_no_verdict(tmp_path):
+    prices = PriceHistory(str(tmp_path))
+    for _ in range(3):
+        prices.record('meesho:/1', 500)
+    assert format_price_history(prices.summary('meesho:/1', 500)) == ''
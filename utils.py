@@ -47,6 +47,22 @@ def get_domain(url):
     parsed = urlparse(url)
     return parsed.netloc.lower().split(':')[0]
 
+def get_platform(url):
+    """Map a URL to its platform key from config.SUPPORTED_DOMAINS"""
+    domain = get_domain(url)
+    for platform, platform_domain in config.SUPPORTED_DOMAINS.items():
+        if domain.endswith(platform_domain):
+            return platform
+    return 'generic'
+
+def product_key(url):
+    """Canonical product key (platform plus cleaned path) for a product URL"""
+    parsed = urlparse(clean_url(url))
+    key = f"{get_platform(url)}:{parsed.path.rstrip('/')}"
+    if parsed.query:
+        key += f"?{parsed.query}"
+    return key
+
 def clean_title(title, is_clothing=False):
     """Clean product title according to requirements"""
     # Convert to English if needed
@@ -86,15 +102,33 @@ def parse_price(price_str):
     except:
         return "Price unavailable"
 
-def format_output(data):
+def format_stock(stock):
+    """Compact per-pin availability line, e.g. Stock - 110001 ✅, 560001 ❌"""
+    marks = {True: '✅', False: '❌', None: '❔'}
+    return "Stock - " + ', '.join(f"{pin} {marks[available]}" for pin, available in stock.items())
+
+def format_price_history(history):
+    """One-line price verdict from a price history summary, or '' if unremarkable"""
+    if history['lowest'] and history['count'] >= config.PRICE_HISTORY_MIN_COUNT:
+        return f"📉 Lowest in {history['days']} days"
+    if history['change_pct'] <= -1:
+        return (f"📉 Price dropped {abs(history['change_pct']):.0f}% "
+                f"({history['days']}-day avg {history['avg']:.0f} rs)")
+    return ''
+
+def format_output(data, advanced=False):
     """Format text according to platform-specific rules"""
     platform = data['platform']
     title = data['title']
     price = data['price']
     url = data['url']
     
-    # Common footer
+    # Common footer (advanced mode adds the price verdict above it)
     footer = "\n@reviewcheckk"
+    if advanced and data.get('price_history'):
+        verdict = format_price_history(data['price_history'])
+        if verdict:
+            footer = f"\n{verdict}{footer}"
     
     # Platform-specific formatting
     if platform == 'meesho':
@@ -108,11 +142,17 @@ def format_output(data):
         # Add pin code
         formatted += f"\nPin - {data.get('pin', config.PIN_DEFAULT)}"
         
+        # Add per-pin availability (advanced mode)
+        if data.get('stock'):
+            formatted += f"\n{format_stock(data['stock'])}"
+        
         return formatted + footer
     
     elif data.get('is_clothing', False):
         # Clothing format (non-Meesho): [Gender] [Quantity] [Clean Title] @[price] rs
         formatted = f"{title} @{price} rs\n{url}"
+        if data.get('stock'):
+            formatted += f"\n{format_stock(data['stock'])}"
         return formatted + footer
     
     else:
@@ -122,19 +162,4 @@ def format_output(data):
 
 def setup_directories():
     """Create necessary directories"""
-    os.makedirs(config.SCREENSHOT_DIR, exist_ok=True)        
-        return formatted + footer
-    
-    elif data.get('is_clothing', False):
-        # Clothing format (non-Meesho): [Gender] [Quantity] [Clean Title] @[price] rs
-        formatted = f"{title} @{price} rs\n{url}"
-        return formatted + footer
-    
-    else:
-        # Non-clothing format: [Brand] [Clean Title] from @[price] rs
-        formatted = f"{title} from @{price} rs\n{url}"
-        return formatted + footer
-
-def setup_directories():
-    """Create necessary directories"""
-    os.makedirs("screenshots", exist_ok=True)
+    os.makedirs(config.SCREENSHOT_DIR, exist_ok=True)
@@ -0,0 +1,98 @@
+"""
+Webhook serving mode for the Telegram Product Scraper Bot
+
+Runs an aiohttp server that receives updates pushed by Telegram instead of
+polling for them. Several replicas can run behind a load balancer; they
+share scrape results and chat state through the local SQLite stores.
+"""
+
+import hmac
+import signal
+import asyncio
+import logging
+
+from aiohttp import web
+from telegram import Update
+
+import config
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+async def handle_update(request):
+    """Validate a pushed update and hand it to the application"""
+    application = request.app['telegram']
+
+    token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not hmac.compare_digest(token.encode(), config.WEBHOOK_SECRET.encode()):
+        logger.warning(f"Rejected webhook call from {request.remote}: bad secret token")
+        return web.Response(status=403)
+
+    # Telegram retries on errors, so a draining replica lets another one take it
+    if request.app['draining'].is_set():
+        return web.Response(status=503)
+
+    try:
+        update = Update.de_json(await request.json(), application.bot)
+    except Exception as e:
+        logger.warning(f"Invalid update payload: {str(e)}")
+        return web.Response(status=400)
+
+    await application.update_queue.put(update)
+    return web.Response()
+
+async def handle_health(request):
+    """Health check for load balancers"""
+    return web.Response(status=503 if request.app['draining'].is_set() else 200, text="ok")
+
+async def serve(application):
+    """Run the bot behind the webhook server until a stop signal arrives"""
+    if not config.WEBHOOK_URL or not config.WEBHOOK_SECRET:
+        raise ValueError("WEBHOOK_URL and WEBHOOK_SECRET must be set for webhook mode")
+
+    await application.initialize()
+    await application.start()
+
+    # Every replica registers the same URL and secret, so this is idempotent
+    await application.bot.set_webhook(
+        url=config.WEBHOOK_URL,
+        secret_token=config.WEBHOOK_SECRET,
+        allowed_updates=Update.ALL_TYPES
+    )
+
+    web_app = web.Application()
+    web_app['telegram'] = application
+    # The app is frozen once running, so shutdown flips this event instead
+    draining = asyncio.Event()
+    web_app['draining'] = draining
+    web_app.router.add_post(config.WEBHOOK_PATH, handle_update)
+    web_app.router.add_get('/healthz', handle_health)
+
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBHOOK_LISTEN, config.WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Webhook server listening on {config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+    await stop_event.wait()
+
+    # Fail health checks and refuse updates while the load balancer moves
+    # traffic away, then stop the server and let in-flight scrapes finish
+    logger.info("Shutting down webhook server, draining in-flight updates")
+    draining.set()
+    await asyncio.sleep(config.WEBHOOK_DRAIN_GRACE)
+    await runner.cleanup()
+    try:
+        await asyncio.wait_for(application.stop(), config.WEBHOOK_DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Drain timeout reached, abandoning remaining updates")
+    await application.shutdown()
+    logger.info("Webhook server stopped")
+
+def run_webhook(application):
+    """Serve the application over webhooks (blocking)"""
+    asyncio.run(serve(application))
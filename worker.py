@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Scraper workers - take jobs from the shared queue and run them through process_link
+
+Usage:
+    python worker.py --workers 4
+"""
+
+import os
+import time
+import signal
+import logging
+import argparse
+import multiprocessing
+
+# Local modules
+import config
+import scraper
+from jobqueue import JobQueue
+from utils import setup_directories
+
+# Setup logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+def worker_loop(index):
+    """Claim and process jobs until asked to stop"""
+    worker_id = f"{os.uname().nodename}-{os.getpid()}-{index}"
+    stopping = []
+
+    # Finish the current job before exiting
+    def request_stop(signum, frame):
+        stopping.append(signum)
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    setup_directories()
+    scraper.enable_driver_pool(1)
+    queue = JobQueue()
+    last_purge = 0
+    logger.info(f"Worker {worker_id} started")
+
+    try:
+        while not stopping:
+            # Purge on a timer, not only when idle, so a busy queue stays bounded
+            if time.time() - last_purge > config.JOB_RESULT_TTL:
+                queue.purge(config.JOB_RESULT_TTL)
+                last_purge = time.time()
+
+            job = queue.claim(worker_id)
+            if job is None:
+                time.sleep(config.JOB_POLL_INTERVAL)
+                continue
+
+            logger.info(f"Worker {worker_id} processing {job['kind']} job {job['id']} "
+                        f"(attempt {job['attempts']}): {job['link']}")
+            try:
+                # Let the bot reply with the text before the screenshot is ready
+                def on_extracted(data, job_id=job['id']):
+                    queue.set_partial(job_id, worker_id, data)
+                result = scraper.run_job(job['kind'], job['link'], job['pin'], on_extracted)
+                if not queue.complete(job['id'], worker_id, result):
+                    logger.warning(f"Job {job['id']} was re-delivered elsewhere, result dropped")
+            except Exception as e:
+                logger.error(f"Job {job['id']} failed: {str(e)}")
+                queue.fail(job['id'], worker_id, str(e))
+    finally:
+        scraper.close_driver_pool()
+        logger.info(f"Worker {worker_id} stopped")
+
+def main():
+    """Start worker processes and wait for them"""
+    parser = argparse.ArgumentParser(description="Run scraper workers for the job queue")
+    parser.add_argument('-w', '--workers', type=int, default=config.WORKER_COUNT,
+                        help="Number of worker processes")
+    args = parser.parse_args()
+
+    processes = [
+        multiprocessing.Process(target=worker_loop, args=(i,), daemon=False)
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Pass shutdown on to the workers so they drain their current job
+    def forward_stop(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+    signal.signal(signal.SIGTERM, forward_stop)
+    signal.signal(signal.SIGINT, forward_stop)
+
+    for process in processes:
+        process.join()
+
+if __name__ == '__main__':
+    main()